@@ -22,6 +22,7 @@ class AIManager:
 
     def start_ai_turn(self):
         self.current_actor = 0
+        self.current_map.update_flow_field()
         for actor in self.actors:
             actor.ai_move()
         self.actors[0].give_priority()
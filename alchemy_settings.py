@@ -1,2 +1,4 @@
 display_width = 1720
 display_height = 900
+# search combat paths with jump point search instead of plain A*, maps can override this with "jump point search"
+jump_point_search = False
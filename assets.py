@@ -0,0 +1,91 @@
+import time
+import pygame
+from collections import OrderedDict
+
+
+class Assets:
+    # images and sounds decoded once and shared by everything that asks for the same file
+    # shared surfaces must not be drawn on, callers that change one take a copy first
+    # least recently used images are dropped once their pixels take up more than max_image_bytes,
+    # anything still holding a dropped image keeps it and the next request loads it again
+    max_image_bytes = 128 * 1024 * 1024
+    max_sounds = 64
+    # (path, alpha, colorkey) -> surface
+    images = OrderedDict()
+    image_bytes = 0
+    # path -> sound
+    sounds = OrderedDict()
+    # loads and hits for each kind of asset, and the seconds spent loading them
+    stats = {
+        "image": {"loads": 0, "hits": 0, "seconds": 0.0},
+        "sound": {"loads": 0, "hits": 0, "seconds": 0.0}
+    }
+
+
+def image(path, alpha=False, colorkey=None):
+    # alpha converts for per pixel transparency, colorkey is a color name or tuple drawn as transparent
+    if colorkey is not None:
+        colorkey = tuple(pygame.Color(colorkey))
+    key = (path, alpha, colorkey)
+    stats = Assets.stats["image"]
+    if key in Assets.images:
+        Assets.images.move_to_end(key)
+        stats["hits"] += 1
+        return Assets.images[key]
+
+    start = time.perf_counter()
+    surface = pygame.image.load(path)
+    if alpha:
+        surface = surface.convert_alpha()
+    else:
+        surface = surface.convert()
+    if colorkey is not None:
+        surface.set_colorkey(colorkey)
+    stats["loads"] += 1
+    stats["seconds"] += time.perf_counter() - start
+
+    Assets.images[key] = surface
+    Assets.image_bytes += surface_bytes(surface)
+    while Assets.image_bytes > Assets.max_image_bytes and len(Assets.images) > 1:
+        old_key, old_surface = Assets.images.popitem(last=False)
+        Assets.image_bytes -= surface_bytes(old_surface)
+    return surface
+
+
+def sound(path):
+    stats = Assets.stats["sound"]
+    if path in Assets.sounds:
+        Assets.sounds.move_to_end(path)
+        stats["hits"] += 1
+        return Assets.sounds[path]
+
+    start = time.perf_counter()
+    loaded = pygame.mixer.Sound(path)
+    stats["loads"] += 1
+    stats["seconds"] += time.perf_counter() - start
+
+    Assets.sounds[path] = loaded
+    while len(Assets.sounds) > Assets.max_sounds:
+        Assets.sounds.popitem(last=False)
+    return loaded
+
+
+def preload(manifest):
+    # loads the assets a scene will ask for up front so the first frames do not wait on the disk
+    # each entry names an image with its load arguments or a sound,
+    # e.g. [{"image": "images/selection_square.png", "colorkey": "black"}, {"sound": "game_sounds/defaultSound.wav"}]
+    for entry in manifest:
+        if "image" in entry:
+            image(entry["image"], entry.get("alpha", False), entry.get("colorkey"))
+        if "sound" in entry:
+            sound(entry["sound"])
+
+
+def surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+def clear():
+    Assets.images.clear()
+    Assets.image_bytes = 0
+    Assets.sounds.clear()
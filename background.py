@@ -0,0 +1,109 @@
+import pygame
+import compositor
+from collections import OrderedDict
+
+
+class ChunkedBackground:
+    # the baked map background, split into square chunks so no single surface has to hold the whole map
+    # chunks are scaled to the camera zoom only when they are first drawn, and kept for the last few zoom levels
+    chunk_size = 512
+    zoom_levels = 3
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.columns = (width + ChunkedBackground.chunk_size - 1) // ChunkedBackground.chunk_size
+        self.rows = (height + ChunkedBackground.chunk_size - 1) // ChunkedBackground.chunk_size
+        self.chunks = {}
+        for column in range(self.columns):
+            for row in range(self.rows):
+                rect = self.world_rect((column, row))
+                self.chunks[(column, row)] = pygame.Surface(rect.size).convert()
+        self.zoom = 1
+        # zoom -> {chunk index: scaled chunk}, least recently used zoom first
+        self.scaled = OrderedDict()
+        self.set_zoom(1)
+
+    def get_width(self):
+        return self.width
+
+    def get_height(self):
+        return self.height
+
+    def world_rect(self, index):
+        size = ChunkedBackground.chunk_size
+        x = index[0] * size
+        y = index[1] * size
+        return pygame.Rect(x, y, min(size, self.width - x), min(size, self.height - y))
+
+    def zoomed_rect(self, index):
+        # edges are rounded from world positions so neighboring chunks meet without gaps
+        rect = self.world_rect(index)
+        x = round(rect.left * self.zoom)
+        y = round(rect.top * self.zoom)
+        return pygame.Rect(x, y, round(rect.right * self.zoom) - x, round(rect.bottom * self.zoom) - y)
+
+    def chunks_in(self, rect, zoomed):
+        # indexes of the chunks a rect touches, in world or zoomed pixels
+        if rect.width <= 0 or rect.height <= 0:
+            return []
+        size = ChunkedBackground.chunk_size
+        if not zoomed:
+            return self.chunk_range(rect.left // size, (rect.right - 1) // size,
+                                    rect.top // size, (rect.bottom - 1) // size)
+        # zoomed chunk edges are rounded, so look one chunk further out and check each one
+        size *= self.zoom
+        indexes = self.chunk_range(int(rect.left // size) - 1, int((rect.right - 1) // size) + 1,
+                                   int(rect.top // size) - 1, int((rect.bottom - 1) // size) + 1)
+        return [index for index in indexes if self.zoomed_rect(index).colliderect(rect)]
+
+    def chunk_range(self, first_column, last_column, first_row, last_row):
+        return [(column, row) for column in range(max(0, first_column), min(self.columns - 1, last_column) + 1)
+                for row in range(max(0, first_row), min(self.rows - 1, last_row) + 1)]
+
+    def fill(self, color):
+        for chunk in self.chunks.values():
+            chunk.fill(color)
+            compositor.changed(chunk)
+        for scaled_chunks in self.scaled.values():
+            scaled_chunks.clear()
+
+    def blit(self, image, position):
+        # draws onto the unscaled background, the chunks it touches are scaled again when next drawn
+        rect = pygame.Rect((position[0], position[1]), image.get_size())
+        for index in self.chunks_in(rect, False):
+            chunk_rect = self.world_rect(index)
+            chunk = self.chunks[index]
+            # at zoom 1 the chunk itself is drawn, so it may already be on screen
+            compositor.changed(chunk, chunk.blit(image, (rect.x - chunk_rect.x, rect.y - chunk_rect.y)))
+            for scaled_chunks in self.scaled.values():
+                scaled_chunks.pop(index, None)
+
+    def set_zoom(self, zoom):
+        self.zoom = zoom
+        if zoom in self.scaled:
+            self.scaled.move_to_end(zoom)
+        else:
+            self.scaled[zoom] = {}
+            while len(self.scaled) > ChunkedBackground.zoom_levels:
+                self.scaled.popitem(last=False)
+
+    def zoomed_chunk(self, index):
+        scaled_chunks = self.scaled[self.zoom]
+        if index not in scaled_chunks:
+            chunk = self.chunks[index]
+            if self.zoom == 1:
+                scaled_chunks[index] = chunk
+            else:
+                scaled_chunks[index] = pygame.transform.scale(chunk, self.zoomed_rect(index).size)
+        return scaled_chunks[index]
+
+    def render(self, screen, offset):
+        # draws the chunks that are on screen with the zoomed background's top left at offset
+        # the offset is rounded once, so every chunk moves by the same whole pixels and no seams open between them
+        offset_x = round(offset[0])
+        offset_y = round(offset[1])
+        view = pygame.Rect(-offset_x, -offset_y, screen.get_width(), screen.get_height())
+        for index in self.chunks_in(view, True):
+            rect = self.zoomed_rect(index)
+            screen.blit(self.zoomed_chunk(index), (rect.x + offset_x, rect.y + offset_y))
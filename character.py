@@ -7,9 +7,12 @@ from random import randint
 from math import ceil
 import skill_handler
 from skill_handler import SkillKeys
+import pathfinding
 from dialogue import draw_shadowed_text
 from dialogue import draw_text
 import json
+import compositor
+import fonts
 
 
 class CharacterKeys:
@@ -101,7 +104,7 @@ class Character(entity.Entity):
             self.data[CharacterKeys.action_points] = 2
 
         # create health bar image
-        self.stat_text = pygame.font.SysFont(None, 24)
+        self.stat_text = fonts.get_font(None, 24)
         self.bar_alpha = 125
         self.bar_height = 20
         self.bar_width = tilemap.tile_extent[0] * 2
@@ -119,7 +122,7 @@ class Character(entity.Entity):
         # create hit chance indicator
         self.chance_image = pygame.Surface((tilemap.tile_extent[0], tilemap.tile_extent[1]))
         self.chance_image.set_colorkey(pygame.Color("black"))
-        self.font = pygame.font.SysFont(None, 30)
+        self.font = fonts.get_font(None, 30)
         self.chance_image_active = False
 
         # create damage indicator
@@ -242,28 +245,20 @@ class Character(entity.Entity):
         if self.accepting_input and self.selected:
             self.set_selected(True)
 
-    def render(self, screen, masks=None):
+    def get_draws(self, occluder=None):
         screen_pos = tilemap.path_to_screen(self.visual_position)
-        if masks is not None and len(masks) > 0:
-            masked_image = self.appearance.copy()
-            for m in masks:
-                # cut out portions of the character that are overlapped by terrain tiles
-                offset = (m.position[0] - self.visual_position[0], m.position[1] - self.visual_position[1])
-                offset = tilemap.path_to_screen(offset, False)
-                masked_image.blit(m.image, (offset[0], offset[1] + self.get_height(False) - m.height))
-            self.render_with_zoom(masked_image, screen, (screen_pos[0], screen_pos[1] - self.get_height()))
-        else:
-            self.render_with_zoom(self.appearance, screen, (screen_pos[0], screen_pos[1] - self.get_height()))
+        return [(self.zoomed_image(occluder), (screen_pos[0], screen_pos[1] - self.get_height()))]
 
     def second_render(self, screen):
         # render health and mana bars
         if self.show_ui:
             screen_pos = tilemap.path_to_screen(self.visual_position)
             height = self.get_height()
-            screen.blit(self.health_bar, (screen_pos[0], screen_pos[1] - height - self.bar_height))
-            screen.blit(self.mana_bar, (screen_pos[0], screen_pos[1] - height))
+            draws = [(self.health_bar, (screen_pos[0], screen_pos[1] - height - self.bar_height)),
+                     (self.mana_bar, (screen_pos[0], screen_pos[1] - height))]
             if self.chance_image_active:
-                screen.blit(self.chance_image, (screen_pos[0] + tilemap.tile_extent[0], screen_pos[1] - height))
+                draws.append((self.chance_image, (screen_pos[0] + tilemap.tile_extent[0], screen_pos[1] - height)))
+            screen.blits(draws, False)
             self.skill_interface.render(screen)
 
             # render any active damage indicators
@@ -285,6 +280,7 @@ class Character(entity.Entity):
                   pygame.Color("black"),
                   (0, 2, self.bar_width, self.bar_height),
                   self.stat_text)
+        compositor.changed(self.health_bar)
 
         self.mana_bar.fill(self.missing_health_color)
         mana = self.get_data(CharacterKeys.current_mana)
@@ -296,6 +292,7 @@ class Character(entity.Entity):
                   pygame.Color("white"),
                   (0, 2, self.bar_width, self.bar_height),
                   self.stat_text)
+        compositor.changed(self.mana_bar)
 
     def notify(self, event):
         if self.active_skill is None:
@@ -391,6 +388,7 @@ class Character(entity.Entity):
         if self.action_points > 0 and len(path) > 1:
             self.path = path
             self.position = [path[-1][0], path[-1][1]]
+            self.current_map.update_occupancy(self)
             self.current_map.z_order_sort_entities()
             self.visual_position = path[0]
             self.accepting_input = False
@@ -424,6 +422,7 @@ class Character(entity.Entity):
             self.chance_image_active = True
             draw_shadowed_text(self.chance_image, str(hit_chance) + "%", pygame.Color("white"),
                                (0, 0, tilemap.tile_extent[0], tilemap.tile_extent[1]), self.font)
+            compositor.changed(self.chance_image)
 
     def display_hit(self, to_display, color):
         self.damage_indicator_fade = 225
@@ -431,6 +430,7 @@ class Character(entity.Entity):
         self.damage_indicator.fill(pygame.Color("purple"))
         draw_shadowed_text(self.damage_indicator, to_display, color,
                            (0, 0, self.bar_width, self.bar_height), self.font)
+        compositor.changed(self.damage_indicator)
 
     def reset_display(self):
         self.update_health_and_mana()
@@ -496,6 +496,8 @@ class Character(entity.Entity):
         if not self.ally:
             self.delete = True
             self.current_map.remove_entities()
+        else:
+            self.current_map.update_occupancy(self)
 
     def stabilize(self):
         self.stabilized = True
@@ -560,43 +562,26 @@ class AICharacter(Character):
         # AI for stupid melee enemies
         if self.action_points > 0:
             move = self.get_movement()
-            all_moves = self.current_map.find_all_paths(self.position, move)
-            closest_target_distance = 99999
-            closest_target = None
-            # find closest party member
-            for c in self.current_map.character_list:
-                all_moves.discard(tuple(c.position))
-                if c.ally and not c.knocked_out:
-                    distance = tilemap.distance_between(self.position, c.position)
-                    if distance < closest_target_distance:
-                        closest_target_distance = distance
-                        closest_target = c
-
-            # find the full path to the closest party member
-            path = self.current_map.find_path(self.position, closest_target.position, 99)
-            # trim the path down to only as far as this character can move
-            prev_space = self.position
-            trimmed_path = []
-            length = 0
-            for space in path:
-                if prev_space[0] != space[0] and prev_space[1] != space[1]:
-                    length += 1.414
-                elif prev_space[0] != space[0] or prev_space[1] != space[1]:
-                    length += 1
-                if length <= move:
-                    trimmed_path.append(space)
-
-            # if the path destination is blocked, find the next closest unblocked destination
-            path_destination = trimmed_path[-1]
-            if path_destination not in all_moves:
-                best_distance = 99999
+            flow_field = self.current_map.flow_field
+
+            # walk down the shared flow field towards the closest party member, as far as this character can move
+            trimmed_path = flow_field.path_from(self.position, move)
+
+            # if the path destination is blocked, find the free destination in reach that is closest to the party
+            if len(trimmed_path) > 0 and self.current_map.is_occupied(trimmed_path[-1], self):
+                path_destination = trimmed_path[-1]
+                all_moves = pathfinding.distance_field(self.current_map.nav_grid, [self.position], move)
+                best_score = None
                 new_destination = None
-                for pos in all_moves:
-                    distance = tilemap.distance_between(path_destination, pos)
-                    if distance < best_distance:
-                        best_distance = distance
+                for pos in all_moves.tiles_within(move):
+                    party_distance = flow_field.cost(pos)
+                    if party_distance is None or self.current_map.is_occupied(pos, self):
+                        continue
+                    score = (party_distance, tilemap.distance_between(path_destination, pos))
+                    if best_score is None or score < best_score:
+                        best_score = score
                         new_destination = pos
-                trimmed_path = self.current_map.find_path(self.position, new_destination, 99)
+                trimmed_path = all_moves.path_to(new_destination) if new_destination is not None else []
 
             self.commit_move(trimmed_path)
         else:
@@ -622,8 +607,8 @@ class AICharacter(Character):
             self.selected_skill_id = 0
             attack_tiles = self.skills[0].targetable_tiles()
             attack_targets = []
-            for c in self.current_map.character_list:
-                if c.ally and tuple(c.position) in attack_tiles:
+            for c in self.current_map.get_characters_in_set(attack_tiles):
+                if c.ally:
                     attack_targets.append(c)
 
             if len(attack_targets) > 0 and self.get_selected_skill().exec_skill(attack_targets[0].position):
@@ -0,0 +1,192 @@
+import pygame
+from collections import Counter
+
+
+class Compositor:
+    # stands in for the display surface: draws are recorded during a frame and compared with the last frame's draws,
+    # then only the regions where they differ are redrawn and sent to the display
+    # past this many separate regions they are merged into one
+    max_regions = 16
+    active = None
+    # surfaces drawn on in place since the last frame by id, with their changed areas or None when all of it changed
+    changed_sources = {}
+    full_redraw = True
+
+    def __init__(self, surface):
+        self.surface = surface
+        self.rect = surface.get_rect()
+        # each draw is (key, screen rect, source, area, special flags)
+        # fills have no source and keep their color as area
+        # keys hold the screen rect at index 1 and compare equal when the draw would put the same pixels there
+        self.draws = []
+        self.last_draws = []
+
+    def get_width(self):
+        return self.rect.width
+
+    def get_height(self):
+        return self.rect.height
+
+    def get_size(self):
+        return self.rect.size
+
+    def get_rect(self):
+        return self.rect.copy()
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        if area is None:
+            size = source.get_size()
+            area_key = None
+        else:
+            area = pygame.Rect(area).clip(source.get_rect())
+            size = area.size
+            area_key = tuple(area)
+        rect = pygame.Rect((dest[0], dest[1]), size)
+        key = (id(source), tuple(rect), area_key, special_flags, source.get_alpha())
+        self.draws.append((key, rect, source, area, special_flags))
+        return rect.clip(self.rect)
+
+    def blits(self, blit_sequence, doreturn=1):
+        # plain (source, dest) draws, which most batches are made of, are recorded here without going through blit
+        draws = self.draws
+        rects = []
+        for item in blit_sequence:
+            if len(item) == 2:
+                source, dest = item
+                rect = pygame.Rect((dest[0], dest[1]), source.get_size())
+                draws.append(((id(source), tuple(rect), None, 0, source.get_alpha()), rect, source, None, 0))
+                if doreturn:
+                    rects.append(rect.clip(self.rect))
+            elif doreturn:
+                rects.append(self.blit(*item))
+            else:
+                self.blit(*item)
+        if doreturn:
+            return rects
+        return None
+
+    def fill(self, color, rect=None, special_flags=0):
+        if rect is None:
+            rect = self.rect.copy()
+        else:
+            rect = pygame.Rect(rect).clip(self.rect)
+        color = tuple(pygame.Color(color))
+        key = ("fill", tuple(rect), color, special_flags)
+        self.draws.append((key, rect, None, color, special_flags))
+        return rect
+
+    def present(self):
+        # draws the parts of this frame that changed onto the display surface and returns them for display.update
+        if Compositor.full_redraw:
+            regions = [self.rect.copy()]
+        else:
+            regions = self.merge_regions(self.dirty_rects())
+        Compositor.full_redraw = False
+        Compositor.changed_sources.clear()
+
+        for region in regions:
+            self.surface.set_clip(region)
+            self.replay()
+        self.surface.set_clip(None)
+        self.last_draws = self.draws
+        self.draws = []
+        return regions
+
+    def dirty_rects(self):
+        rects = []
+        # draws only in one of the two frames
+        unmatched = Counter(draw[0] for draw in self.last_draws)
+        kept = []
+        for draw in self.draws:
+            if unmatched[draw[0]] > 0:
+                unmatched[draw[0]] -= 1
+                kept.append(draw[0])
+            else:
+                rects.append(draw[1])
+        for draw in self.last_draws:
+            if unmatched[draw[0]] > 0:
+                unmatched[draw[0]] -= 1
+                rects.append(draw[1])
+
+        # draws in both frames that swapped places in the drawing order
+        matched = Counter(kept)
+        last_kept = []
+        for draw in self.last_draws:
+            if matched[draw[0]] > 0:
+                matched[draw[0]] -= 1
+                last_kept.append(draw[0])
+        if kept != last_kept:
+            for key, last_key in zip(kept, last_kept):
+                if key != last_key:
+                    rects.append(pygame.Rect(key[1]))
+                    rects.append(pygame.Rect(last_key[1]))
+
+        # surfaces that were drawn on in place
+        changed_sources = Compositor.changed_sources
+        if len(changed_sources) > 0:
+            for key, rect, source, area, special_flags in self.draws:
+                if source is None or id(source) not in changed_sources:
+                    continue
+                areas = changed_sources[id(source)]
+                if areas is None:
+                    rects.append(rect)
+                    continue
+                offset_x = rect.x
+                offset_y = rect.y
+                if area is not None:
+                    offset_x -= area.x
+                    offset_y -= area.y
+                for changed_area in areas:
+                    rects.append(changed_area.move(offset_x, offset_y).clip(rect))
+        return rects
+
+    def merge_regions(self, rects):
+        regions = []
+        for rect in rects:
+            rect = rect.clip(self.rect)
+            if rect.width == 0 or rect.height == 0:
+                continue
+            # grow the rect over every region it overlaps so regions never draw the same pixels twice
+            index = rect.collidelist(regions)
+            while index >= 0:
+                rect.union_ip(regions.pop(index))
+                index = rect.collidelist(regions)
+            regions.append(rect)
+        if len(regions) > Compositor.max_regions:
+            regions = [regions[0].unionall(regions[1:])]
+        return regions
+
+    def replay(self):
+        batch = []
+        for key, rect, source, area, special_flags in self.draws:
+            if source is None:
+                if len(batch) > 0:
+                    self.surface.blits(batch, False)
+                    batch = []
+                self.surface.fill(area, rect, special_flags)
+            else:
+                batch.append((source, rect, area, special_flags))
+        if len(batch) > 0:
+            self.surface.blits(batch, False)
+
+
+def get_screen():
+    # the compositor wrapping the current display surface, which everything in the game draws into
+    if Compositor.active is None or Compositor.active.surface is not pygame.display.get_surface():
+        Compositor.active = Compositor(pygame.display.get_surface())
+    return Compositor.active
+
+
+def changed(surface, rect=None):
+    # call after drawing onto a surface that may already be on screen, rect limits the change to part of the surface
+    areas = Compositor.changed_sources.get(id(surface), [])
+    if rect is None or areas is None:
+        Compositor.changed_sources[id(surface)] = None
+    else:
+        areas.append(pygame.Rect(rect))
+        Compositor.changed_sources[id(surface)] = areas
+
+
+def redraw_all():
+    # for code that drew straight to the display, the next frame is redrawn and sent to the display in full
+    Compositor.full_redraw = True
@@ -1,54 +1,21 @@
 import pygame
 import json
 import alchemy_settings as a_settings
+import compositor
+import text_layout
+import fonts
+import assets
 
 
 def draw_text(surface, text, color, rect, font, aa=False, bkg=None):
-    y = rect[1]
-    line_spacing = -2
-
-    # get the height of the font
-    font_height = font.size("Tg")[1]
-
-    while text:
-        i = 1
-
-        # determine if the row of text will be outside our area
-        # if y + font_height > rect[1] + rect[3]:
-        #    break
-
-        # determine maximum width of line
-        while font.size(text[:i])[0] < rect[2] and i < len(text):
-            i += 1
-            if i < len(text) and text[i] == "\n":
-                i += 1
-                break
-
-        # if we've wrapped the text, then adjust the wrap to the last word
-        if i < len(text):
-            i = max(text.rfind(" ", 0, i) + 1, text.rfind("\n", 0, i) + 1)
-
-        # render the line and blit it to the surface
-        clean_text = text[:i].replace("\n", "")
-        if bkg:
-            image = font.render(clean_text, 1, color, bkg)
-            image.set_colorkey(bkg)
-        else:
-            image = font.render(clean_text, aa, color)
-
-        surface.blit(image, (rect[0], y))
-        y += font_height + line_spacing
-
-        # remove the text we just blit
-        text = text[i:]
-
-    return text
+    text_layout.draw_lines(surface, text_layout.wrap(text, font, rect[2]), color, rect, font, aa, bkg)
 
 
 def draw_shadowed_text(surface, text, color, rect, font, aa=False, bkg=None):
-    rect2 = (rect[0] + 2, rect[1] + 2, rect[2], rect[3])
-    draw_text(surface, text, (0, 0, 1), rect2, font, aa, bkg)
-    draw_text(surface, text, color, rect, font, aa, bkg)
+    # the shadow and the text share one layout
+    lines = text_layout.wrap(text, font, rect[2])
+    text_layout.draw_lines(surface, lines, (0, 0, 1), (rect[0] + 2, rect[1] + 2), font, aa, bkg)
+    text_layout.draw_lines(surface, lines, color, rect, font, aa, bkg)
 
 
 class Dialogue:
@@ -66,7 +33,7 @@ class Dialogue:
 
         self.current_line = 0
         self.break_message = None
-        self.font = pygame.font.SysFont(None, Dialogue.font_size)
+        self.font = fonts.get_font(None, Dialogue.font_size)
         self.text = " "
         self.text_color = pygame.Color(Dialogue.font_color)
         self.speaker = " "
@@ -142,12 +109,11 @@ class Dialogue:
                     else:
                         self.portrait_active = True
                         image_file = "images/characters/" + line["portrait"] + ".png"
-                        self.portrait = pygame.image.load(image_file).convert()
-                        self.portrait.set_colorkey(pygame.Color("white"))
+                        self.portrait = assets.image(image_file, colorkey="white")
                         self.portrait_dict[self.speaker] = image_file
                 elif self.speaker in self.portrait_dict:
                     self.portrait_active = True
-                    self.portrait = pygame.image.load(self.portrait_dict[self.speaker])
+                    self.portrait = assets.image(self.portrait_dict[self.speaker])
                 else:
                     self.portrait_active = False
 
@@ -163,6 +129,7 @@ class Dialogue:
                           (speech_pad_left, title_height,
                            self.speech.get_width() - speech_pad_left * 2, self.speech.get_height() - title_height),
                           self.font, True)
+                compositor.changed(self.speech)
             elif "break" in line:
                 self.break_message = line["break"]
                 self.active = False
@@ -2,6 +2,9 @@ import pygame
 import tilemap
 import dialogue
 import user_interface
+import sprite_cache
+import fonts
+import assets
 
 
 class Entity:
@@ -15,8 +18,7 @@ class Entity:
             self.image_directory = "images/entity/" + entity_data["appearance"] + "/"
         else:
             self.image_directory = "images/entity/default/"
-        self.appearance = pygame.image.load(self.image_directory + "default.png").convert()
-        self.appearance.set_colorkey(pygame.Color("black"))
+        self.appearance = assets.image(self.image_directory + "default.png", colorkey="black")
 
         # position is real gameplay position, in path coordinates
         self.position = [position[0], position[1]]
@@ -28,6 +30,9 @@ class Entity:
         self.ally = False
         self.accepting_input = False
         self.delete = False
+        # appearance with terrain cut out, kept while the entity stands still
+        self.masked_image = None
+        self.masked_key = None
 
     def __lt__(self, other):
         return self.get_z() < other.get_z()
@@ -53,27 +58,34 @@ class Entity:
     def update(self, deltatime):
         pass
 
-    def render(self, screen, masks=None):
-        if self.appearance is not None:
-            screen_pos = tilemap.path_to_screen(self.get_render_pos())
-            if masks is not None and len(masks) > 0:
-                masked_image = self.appearance.copy()
-                for m in masks:
-                    # cut out portions of the character that are overlapped by terrain tiles
-                    offset = (m.position[0] - self.get_render_pos()[0], m.position[1] - self.get_render_pos()[1])
-                    offset = tilemap.path_to_screen(offset, False)
-                    masked_image.blit(m.image, (offset[0], offset[1] + self.get_height(False) - m.height))
-                self.render_with_zoom(masked_image, screen, (screen_pos[0], screen_pos[1] - self.get_height()))
-            else:
-                self.render_with_zoom(self.appearance, screen, (screen_pos[0], screen_pos[1] - self.get_height()))
-
-    def render_with_zoom(self, image, dest, dest_pos):
-        zoomed = pygame.transform.scale(
-            image,
-            (round(self.appearance.get_width() * tilemap.Camera.zoom),
-             round(self.appearance.get_height() * tilemap.Camera.zoom)),
-        )
-        dest.blit(zoomed, (dest_pos[0], dest_pos[1]))
+    def render(self, screen, occluder=None):
+        screen.blits(self.get_draws(occluder), False)
+
+    def get_draws(self, occluder=None):
+        # images and screen positions this entity draws on the map, in drawing order
+        if self.appearance is None:
+            return []
+        screen_pos = tilemap.path_to_screen(self.get_render_pos())
+        return [(self.zoomed_image(occluder), (screen_pos[0], screen_pos[1] - self.get_height()))]
+
+    def zoomed_image(self, occluder=None):
+        # appearance at the current zoom, with the terrain in front of it cut out when there is an occluder
+        zoom = tilemap.Camera.zoom
+        image = sprite_cache.scaled(self.appearance, zoom)
+        if occluder is None:
+            return image
+        render_pos = self.get_render_pos()
+        key = (occluder, zoom, render_pos[0], render_pos[1], self.height)
+        if key != self.masked_key:
+            # the occluder is placed relative to the tile the entity stands on
+            tile = (round(render_pos[0]), round(render_pos[1]))
+            offset = tilemap.path_to_world((tile[0] - render_pos[0], tile[1] - render_pos[1]))
+            self.masked_image = image.copy()
+            self.masked_image.blit(sprite_cache.scaled(occluder.image, zoom),
+                                   ((occluder.offset[0] + offset[0]) * zoom,
+                                    (occluder.offset[1] + offset[1] + self.get_height(False)) * zoom))
+            self.masked_key = key
+        return self.masked_image
 
     def on_highlight(self):
         pass
@@ -95,7 +107,7 @@ class InteractiveEntity(Entity):
     def __init__(self, position, current_map, entity_data):
         super().__init__(position, current_map, entity_data)
         message = entity_data["message"]
-        font = pygame.font.SysFont(None, 36)
+        font = fonts.get_font(None, 36)
         message_size = font.size(message)
         self.message_image = pygame.Surface((message_size[0], message_size[1])).convert()
         self.message_image.set_colorkey(pygame.Color("black"))
@@ -122,11 +134,12 @@ class InteractiveEntity(Entity):
     def notify(self, event):
         pass
 
-    def render(self, screen, masks=None):
-        super().render(screen, masks)
+    def get_draws(self, occluder=None):
+        draws = super().get_draws(occluder)
         if self.message_active:
             location = tilemap.path_to_screen(self.get_render_pos())
-            screen.blit(self.message_image, (location[0], location[1] - tilemap.tile_extent[1] * 2))
+            draws.append((self.message_image, (location[0], location[1] - tilemap.tile_extent[1] * 2)))
+        return draws
 
     def second_render(self, screen):
         pass
@@ -0,0 +1,205 @@
+from functools import lru_cache
+from navigation import NavFlags
+
+
+def supercover_line(p0, p1):
+    dx = p1[0] - p0[0]
+    dy = p1[1] - p0[1]
+    nx = abs(dx)
+    ny = abs(dy)
+
+    if dx == 0:
+        points = []
+        for pos in range(ny):
+            points.append([p0[0], min(p0[1], p1[1]) + pos])
+        return points
+    elif dx > 0:
+        sign_x = 1
+    else:
+        sign_x = -1
+
+    if dy == 0:
+        points = []
+        for pos in range(nx):
+            points.append([min(p0[0], p1[0]) + pos, p0[1]])
+        return points
+    elif dy > 0:
+        sign_y = 1
+    else:
+        sign_y = -1
+
+    p = [p0[0], p0[1]]
+    points = [[p[0], p[1]]]
+    ix = 0
+    iy = 0
+    while ix < nx or iy < ny:
+        if (0.5 + ix) / nx == (0.5 + iy) / ny:
+            # next step is diagonal
+            p[0] += sign_x
+            p[1] += sign_y
+            ix += 1
+            iy += 1
+        elif (0.5 + ix) / nx < (0.5 + iy) / ny:
+            # next step is horizontal
+            p[0] += sign_x
+            ix += 1
+        else:
+            # next step is vertical
+            p[1] += sign_y
+            iy += 1
+        points.append((p[0], p[1]))
+    return points
+
+
+@lru_cache(maxsize=4096)
+def ray(offset):
+    # a supercover line only depends on the offset between its ends, so one copy is shared by every origin
+    return tuple((point[0], point[1]) for point in supercover_line((0, 0), offset))
+
+
+class ShadowTable:
+    # lists, for every cell around an origin, the targets whose line of sight runs through that cell
+    # an opaque cell then hides all of its targets at once, bit i of a shadow refers to targets[i]
+    def __init__(self, reach):
+        self.targets = []
+        shadows = {}
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                bit = 1 << len(self.targets)
+                self.targets.append((dx, dy))
+                for cell in ray((dx, dy)):
+                    shadows[cell] = shadows.get(cell, 0) | bit
+        self.all_targets = (1 << len(self.targets)) - 1
+        self.shadows = tuple(shadows.items())
+
+
+_shadow_tables = {}
+
+
+def get_shadow_table(radius):
+    reach = int(radius)
+    if reach not in _shadow_tables:
+        _shadow_tables[reach] = ShadowTable(reach)
+    return _shadow_tables[reach]
+
+
+def visible_tiles(grid, origin, radius):
+    # ids of the tiles within radius that origin has line of sight to, found in one sweep over the nearby cells
+    # uses the same supercover lines as line_of_sight, so both always agree
+    table = get_shadow_table(radius)
+    flags = grid.flags
+    transparent = NavFlags.transparent
+    origin_x = origin[0]
+    origin_y = origin[1]
+
+    blocked = 0
+    for cell, shadow in table.shadows:
+        tile_id = grid.tile_id((origin_x + cell[0], origin_y + cell[1]))
+        if tile_id < 0 or not flags[tile_id] & transparent:
+            blocked |= shadow
+
+    visible = set()
+    targets = table.targets
+    remaining = table.all_targets & ~blocked
+    while remaining:
+        lowest = remaining & -remaining
+        target = targets[lowest.bit_length() - 1]
+        tile_id = grid.tile_id((origin_x + target[0], origin_y + target[1]))
+        if tile_id >= 0:
+            visible.add(tile_id)
+        remaining ^= lowest
+    return visible
+
+
+def line_of_sight(grid, p0, p1):
+    x = p0[0]
+    y = p0[1]
+    for cell in ray((p1[0] - x, p1[1] - y)):
+        if not grid.has_flags((x + cell[0], y + cell[1]), NavFlags.transparent):
+            return False
+    return True
+
+
+class SightCache:
+    # remembers line of sight answers so repeated questions during a turn are not traced again
+    # pair answers are kept as two bitsets over tile ids per origin: targets already checked, and targets in sight
+    max_origins = 256
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.known = {}
+        self.visible = {}
+        self.sweeps = {}
+        # furthest distance from each origin that anything is cached for, used to find stale origins on edits
+        self.reach = {}
+        self.hits = 0
+        self.misses = 0
+
+    def line_of_sight(self, p0, p1):
+        grid = self.grid
+        origin = grid.tile_id(p0)
+        target = grid.tile_id(p1)
+        if origin < 0 or target < 0:
+            return line_of_sight(grid, p0, p1)
+
+        bit = 1 << target
+        known = self.known.get(origin, 0)
+        if known & bit:
+            self.hits += 1
+            return self.visible[origin] & bit != 0
+
+        self.misses += 1
+        result = line_of_sight(grid, p0, p1)
+        self.remember(origin, max(abs(p1[0] - p0[0]), abs(p1[1] - p0[1])))
+        self.known[origin] = known | bit
+        visible = self.visible.get(origin, 0)
+        if result:
+            visible |= bit
+        self.visible[origin] = visible
+        return result
+
+    def visible_tiles(self, origin, radius):
+        # the returned set is shared between callers and must not be changed
+        origin_id = self.grid.tile_id(origin)
+        reach = int(radius)
+        sweeps = self.sweeps.get(origin_id)
+        if sweeps is not None and reach in sweeps:
+            self.hits += 1
+            return sweeps[reach]
+
+        self.misses += 1
+        visible = visible_tiles(self.grid, origin, radius)
+        if origin_id >= 0:
+            self.remember(origin_id, reach)
+            self.sweeps.setdefault(origin_id, {})[reach] = visible
+        return visible
+
+    def remember(self, origin, reach):
+        if origin not in self.reach:
+            if len(self.reach) >= SightCache.max_origins:
+                # forget the origin that was cached first
+                self.forget(next(iter(self.reach)))
+            self.reach[origin] = reach
+        elif reach > self.reach[origin]:
+            self.reach[origin] = reach
+
+    def forget(self, origin):
+        self.reach.pop(origin, None)
+        self.known.pop(origin, None)
+        self.visible.pop(origin, None)
+        self.sweeps.pop(origin, None)
+
+    def invalidate(self, coords):
+        # a line can only pass through tiles inside the box between its ends,
+        # so only origins that have cached something at least this far away can be affected
+        for origin, reach in list(self.reach.items()):
+            origin_x, origin_y = self.grid.tile_coords(origin)
+            if max(abs(coords[0] - origin_x), abs(coords[1] - origin_y)) <= reach:
+                self.forget(origin)
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = 0
+        if total > 0:
+            hit_rate = self.hits / total
+        return {"hits": self.hits, "misses": self.misses, "hit rate": hit_rate, "origins": len(self.reach)}
@@ -0,0 +1,23 @@
+import pygame
+
+
+class FontRegistry:
+    # fonts shared by the whole game by (name, size), a name of None is pygame's default font
+    # SysFont searches the system font list, so each font is only built the first time it is asked for
+    fonts = {}
+    # fonts the game uses everywhere, loaded at startup by warm
+    common = [(None, 24), (None, 26), (None, 30), (None, 36), (None, 40), (None, 48)]
+
+
+def get_font(name, size):
+    key = (name, size)
+    if key not in FontRegistry.fonts:
+        FontRegistry.fonts[key] = pygame.font.SysFont(name, size)
+    return FontRegistry.fonts[key]
+
+
+def warm(font_keys=None):
+    if font_keys is None:
+        font_keys = FontRegistry.common
+    for name, size in font_keys:
+        get_font(name, size)
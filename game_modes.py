@@ -3,13 +3,14 @@ import tilemap
 import level_editor
 import dialogue
 import strategy_map
-import pygame
+import compositor
+import profiler
 
 
 class GameMode:
     def __init__(self):
         self.new_mode = None
-        self.screen = pygame.display.get_surface()
+        self.screen = compositor.get_screen()
         self.paused = False
         self.pause_menu = user_interface.UserInterface(False)
         self.pause_menu.add_image_button((0.45, 0.5, 0.1, 0.05), "Menu", "quit")
@@ -68,8 +69,10 @@ class BasicScene(GameMode):
     def update(self, deltatime):
         super().update(deltatime)
         if not self.paused:
-            self.current_map.update(deltatime)
-            self.current_map.render(self.screen)
+            with profiler.scope("map update"):
+                self.current_map.update(deltatime)
+            with profiler.scope("render"):
+                self.current_map.render(self.screen)
             if self.current_map.change_scene:
                 self.new_mode = self.current_map.next_scene
 
@@ -3,6 +3,7 @@ import tilemap
 from tilemap import TileKeys
 import json
 import user_interface
+import compositor
 from scenes import scenes
 
 
@@ -31,7 +32,7 @@ class LevelEditor(tilemap.CombatMap):
         self.tile_list = converted_map
 
     def update(self, deltatime):
-        screen = pygame.display.get_surface()
+        screen = compositor.get_screen()
         prev_coords = [0, 0]
         if self.mouse_coords is not None:
             prev_coords = [self.mouse_coords[0], self.mouse_coords[1]]
@@ -138,6 +139,7 @@ class LevelEditor(tilemap.CombatMap):
             with open("data/scenes/" + filename + ".json", 'r') as map_file:
                 self.tile_list = json.load(map_file)
                 self.default_background()
+                self.build_navigation()
                 self.create_background()
 
     def new_map(self):
@@ -145,6 +147,7 @@ class LevelEditor(tilemap.CombatMap):
                       int(user_interface.get_text_input(pygame.display.get_surface(), "Map height:"))]
         self.tile_list.clear()
         self.default_background(dimensions)
+        self.build_navigation()
         self.create_background()
 
     def edit_tile(self):
@@ -5,12 +5,17 @@ import alchemy_settings as a_settings
 from os import environ
 from code import interact
 import gc
+import compositor
+import fonts
+import profiler
 
 environ['SDL_VIDEO_CENTERED'] = '1'
 pygame.mixer.pre_init()
 pygame.init()
 
-screen = pygame.display.set_mode((a_settings.display_width, a_settings.display_height))
+pygame.display.set_mode((a_settings.display_width, a_settings.display_height))
+# everything draws into the compositor, which sends only the changed parts of each frame to the display
+screen = compositor.get_screen()
 pygame.display.set_caption('Alchemy Journey')
 clock = pygame.time.Clock()
 runtime = 0
@@ -18,7 +23,8 @@ crashed = False
 debug = False
 
 # set up fonts
-basicFont = pygame.font.SysFont(None, 36)
+fonts.warm()
+basicFont = fonts.get_font(None, 36)
 
 game_mode = game_modes.MainMenu()
 
@@ -33,30 +39,40 @@ while not crashed:
 
     keypress = None
     # handle pygame events
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            crashed = True
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_BACKQUOTE:
-                debug = not debug
-                if event.mod & pygame.KMOD_LSHIFT:
-                    interact(local=locals())
-            if event.key == pygame.K_ESCAPE:
-                game_mode.toggle_pause()
-        game_mode.notify(event)
+    with profiler.scope("events"):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                crashed = True
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_BACKQUOTE:
+                    debug = not debug
+                    # frame timings are only taken while debug info is shown
+                    profiler.set_enabled(debug)
+                    if event.mod & pygame.KMOD_LSHIFT:
+                        interact(local=locals())
+                if event.key == pygame.K_F9 and debug:
+                    print("frame timings written to", ", ".join(profiler.dump()))
+                if event.key == pygame.K_ESCAPE:
+                    game_mode.toggle_pause()
+            game_mode.notify(event)
 
     # cProfile.runctx('game_mode.update(deltatime)', globals(), locals())
-    game_mode.update(get_deltatime())
+    with profiler.scope("update"):
+        game_mode.update(get_deltatime())
     if game_mode.new_mode is not None:
-        game_mode = game_mode.new_mode
-        gc.collect()
+        with profiler.scope("mode switch"):
+            game_mode = game_mode.new_mode
+            gc.collect()
 
     if debug:
         text = basicFont.render(str(int(clock.get_fps())), True, pygame.Color("white"), pygame.Color("blue"))
         screen.blit(text, (0, 0))
+        profiler.render_overlay(screen)
 
-    pygame.display.update()
+    with profiler.scope("present"):
+        pygame.display.update(screen.present())
     clock.tick(144)
+    profiler.end_frame()
 
 pygame.quit()
 quit()
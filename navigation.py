@@ -0,0 +1,171 @@
+class NavFlags:
+    # bits stored in each byte of a NavGrid
+    in_bounds = 1
+    walkable = 2
+    transparent = 4
+    occupied = 8
+    tall = 16
+
+
+class NavGrid:
+    # one byte of flags per tile, indexed by integer ids so searches never build coordinate tuples
+    # ids are laid out by rotated coordinates u = x + y and v = x - y, which turns the map diamond into a rectangle
+    # the grid is padded so every neighbor of an in-bounds tile is still a valid index
+    padding = 2
+
+    def __init__(self, map_width, map_height):
+        self.map_width = map_width
+        self.map_height = map_height
+        self.stride = map_width * 2 + NavGrid.padding * 2
+        self.rows = map_height + NavGrid.padding * 2
+        self.size = self.stride * self.rows
+        self.flags = bytearray(self.size)
+        # bumped whenever walkability or sight changes, so data derived from the grid knows when to rebuild
+        self.version = 0
+        self.bit_cache = {}
+
+        # id offsets for each neighbor direction, in the same order find_path has always used
+        self.orthogonal = tuple(self.delta(offset) for offset in [(0, -1), (0, 1), (-1, 0), (1, 0)])
+        # diagonal moves also carry the two orthogonal tiles that can block them
+        self.diagonal = tuple(
+            (self.delta(offset), self.delta((offset[0], 0)), self.delta((0, offset[1])))
+            for offset in [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+        )
+
+    def delta(self, offset):
+        # difference in id between a tile and the tile at the given path coordinate offset
+        return (offset[0] + offset[1]) * self.stride + offset[0] - offset[1]
+
+    def tile_id(self, coords):
+        # returns -1 when the coordinates fall outside of the padded grid
+        u = coords[0] + coords[1] + NavGrid.padding
+        v = coords[0] - coords[1] + NavGrid.padding
+        if 0 <= u < self.rows and 0 <= v < self.stride:
+            return u * self.stride + v
+        return -1
+
+    def map_tile_id(self, map_coords):
+        # id of a tile given in map coordinates, the inverse of path_to_map
+        row = map_coords[1]
+        return (row + NavGrid.padding) * self.stride + map_coords[0] * 2 + row % 2 + NavGrid.padding
+
+    def tile_coords(self, tile_id):
+        u = tile_id // self.stride - NavGrid.padding
+        v = tile_id % self.stride - NavGrid.padding
+        return (u + v) // 2, (u - v) // 2
+
+    def has_flags(self, coords, mask):
+        tile_id = self.tile_id(coords)
+        return tile_id >= 0 and self.flags[tile_id] & mask == mask
+
+    def set_tile(self, tile_id, walkable, transparent, tall):
+        # keep the occupied bit, it is managed separately from the tile data
+        flags = NavFlags.in_bounds | (self.flags[tile_id] & NavFlags.occupied)
+        if walkable:
+            flags |= NavFlags.walkable
+        if transparent:
+            flags |= NavFlags.transparent
+        if tall:
+            flags |= NavFlags.tall
+        if flags != self.flags[tile_id]:
+            self.flags[tile_id] = flags
+            self.version += 1
+
+    def flag_bits(self, mask):
+        # one bit per tile id for the tiles with all of the mask flags, as a TileSet stores them
+        # only for flags that bump the version, occupied changes separately and is not tracked here
+        cached = self.bit_cache.get(mask)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        table = bytes(0x31 if value & mask == mask else 0x30 for value in range(256))
+        bits = int(self.flags.translate(table)[::-1], 2)
+        self.bit_cache[mask] = (self.version, bits)
+        return bits
+
+    def set_flag(self, tile_id, flag, value):
+        if value:
+            self.flags[tile_id] |= flag
+        else:
+            self.flags[tile_id] &= ~flag
+
+
+class WalkableRegions:
+    # labels each walkable tile with the region it belongs to, tiles in different regions can never reach each other
+    # diagonal moves need both side tiles walkable, so regions only have to follow orthogonal steps
+    def __init__(self, grid):
+        self.grid = grid
+        self.labels = [0] * grid.size
+        self.sizes = {}
+        self.next_label = 1
+        for tile_id in range(grid.size):
+            if grid.flags[tile_id] & NavFlags.walkable and self.labels[tile_id] == 0:
+                self.fill(tile_id, self.new_label())
+
+    def new_label(self):
+        label = self.next_label
+        self.next_label += 1
+        return label
+
+    def fill(self, tile_id, label):
+        # relabel every walkable tile connected to tile_id
+        flags = self.grid.flags
+        labels = self.labels
+        walkable = NavFlags.walkable
+        old_label = labels[tile_id]
+        labels[tile_id] = label
+        open_list = [tile_id]
+        size = 0
+        while open_list:
+            current = open_list.pop()
+            size += 1
+            for delta in self.grid.orthogonal:
+                neighbor = current + delta
+                if labels[neighbor] != label and flags[neighbor] & walkable:
+                    labels[neighbor] = label
+                    open_list.append(neighbor)
+        if old_label in self.sizes:
+            self.sizes[old_label] -= size
+            if self.sizes[old_label] <= 0:
+                del self.sizes[old_label]
+        self.sizes[label] = self.sizes.get(label, 0) + size
+
+    def region(self, coords):
+        # returns 0 for tiles that are not walkable
+        tile_id = self.grid.tile_id(coords)
+        if tile_id < 0:
+            return 0
+        return self.labels[tile_id]
+
+    def connected(self, p0, p1):
+        region = self.region(p0)
+        return region != 0 and region == self.region(p1)
+
+    def update(self, tile_id):
+        # called after a tile changes walkability
+        grid = self.grid
+        labels = self.labels
+        neighbors = [tile_id + delta for delta in grid.orthogonal if grid.flags[tile_id + delta] & NavFlags.walkable]
+        if grid.flags[tile_id] & NavFlags.walkable:
+            # joins the regions around it, the largest one keeps its label and the others are relabeled
+            regions = {labels[neighbor] for neighbor in neighbors}
+            if len(regions) == 0:
+                labels[tile_id] = self.new_label()
+                self.sizes[labels[tile_id]] = 1
+                return
+            largest = max(regions, key=lambda label: self.sizes[label])
+            labels[tile_id] = largest
+            self.sizes[largest] += 1
+            for neighbor in neighbors:
+                if labels[neighbor] != largest:
+                    self.fill(neighbor, largest)
+        else:
+            # may split its region, give each side that is no longer connected a label of its own
+            old_label = labels[tile_id]
+            labels[tile_id] = 0
+            if old_label in self.sizes:
+                self.sizes[old_label] -= 1
+                if self.sizes[old_label] <= 0:
+                    del self.sizes[old_label]
+            for neighbor in neighbors[1:]:
+                if labels[neighbor] == old_label:
+                    self.fill(neighbor, self.new_label())
@@ -0,0 +1,73 @@
+import pygame
+import tilemap
+from navigation import NavFlags
+
+
+class Occluder:
+    # the masks of all terrain drawn in front of an entity standing on a tile, composed into one image
+    # offset is where the image goes in world pixels relative to the tile's own position
+    def __init__(self, image, offset):
+        self.image = image
+        self.offset = offset
+
+
+class OcclusionIndex:
+    # tiles in front of an entity that can be drawn over it, as offsets from the tile the entity stands on
+    neighbors = [(0, 1), (1, 0), (1, 1), (1, -1), (-1, 1)]
+
+    def __init__(self, tile_map):
+        self.tile_map = tile_map
+        self.grid = tile_map.nav_grid
+        # path coordinates -> Occluder, tiles without tall neighbors are left out
+        self.occluders = {}
+        # occluders shared by every tile with the same layout of tall neighbors
+        self.layouts = {}
+        grid = self.grid
+        for tile_id in range(grid.size):
+            if grid.flags[tile_id] & NavFlags.in_bounds:
+                self.update_tile(grid.tile_coords(tile_id))
+
+    def get(self, tile):
+        return self.occluders.get(tile)
+
+    def invalidate(self, coords):
+        # called when a tile changes, every tile it stands in front of is composed again
+        self.update_tile(coords)
+        for dx, dy in OcclusionIndex.neighbors:
+            self.update_tile((coords[0] - dx, coords[1] - dy))
+
+    def update_tile(self, tile):
+        layout = []
+        for dx, dy in OcclusionIndex.neighbors:
+            neighbor = (tile[0] + dx, tile[1] + dy)
+            if self.grid.has_flags(neighbor, NavFlags.tall):
+                layers = self.tile_map.get_tile_attributes(tilemap.path_to_map(neighbor))[tilemap.TileKeys.tiles]
+                for layer in layers:
+                    if layer[tilemap.TileKeys.height] > 0:
+                        layout.append((dx, dy, layer[tilemap.TileKeys.id], layer[tilemap.TileKeys.height]))
+        if len(layout) == 0:
+            self.occluders.pop(tile, None)
+            return
+        layout = tuple(layout)
+        if layout not in self.layouts:
+            self.layouts[layout] = self.compose(layout)
+        if self.layouts[layout] is None:
+            self.occluders.pop(tile, None)
+        else:
+            self.occluders[tile] = self.layouts[layout]
+
+    def compose(self, layout):
+        # place each mask where it is drawn relative to the tile, then crop to the covered area
+        placed = []
+        for dx, dy, tile_id, height in layout:
+            mask = self.tile_map.tile_masks[tile_id]
+            position = tilemap.path_to_world((dx, dy))
+            placed.append((mask, pygame.Rect(position[0], position[1] - height, mask.get_width(), mask.get_height())))
+        bounds = placed[0][1].unionall([rect for mask, rect in placed[1:]])
+        image = pygame.Surface(bounds.size, pygame.SRCALPHA)
+        for mask, rect in placed:
+            image.blit(mask, (rect.x - bounds.x, rect.y - bounds.y))
+        covered = image.get_bounding_rect()
+        if covered.width == 0 or covered.height == 0:
+            return None
+        return Occluder(image.subsurface(covered).copy(), (bounds.x + covered.x, bounds.y + covered.y))
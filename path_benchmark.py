@@ -0,0 +1,87 @@
+import json
+import os
+import random
+import sys
+import time
+import navigation
+from navigation import NavFlags
+import pathfinding
+
+# compares plain A* against jump point search on the shipped maps
+# usage: python path_benchmark.py [map files...]
+# reads tile files directly so the game and pygame do not need to be started
+
+queries_per_map = 300
+max_length = 99
+
+
+def load_grid(filename):
+    with open(filename) as map_file:
+        tile_list = json.load(map_file)
+    # older maps store keys as "x,y", which the game does not read, so like in game they are open ground
+    positions = [tile_position(key) for key in tile_list.keys()]
+    map_width = max(pos[0] for pos in positions) + 1
+    map_height = max(pos[1] for pos in positions) + 1
+    grid = navigation.NavGrid(map_width, map_height)
+    for i in range(map_width):
+        for j in range(map_height):
+            hashed = str(i * 1000 + j)
+            walkable = True
+            transparent = True
+            if hashed in tile_list:
+                walkable = tile_list[hashed]["walk"]
+                transparent = tile_list[hashed]["los"]
+            grid.set_tile(grid.map_tile_id((i, j)), walkable, transparent, False)
+    return grid
+
+
+def tile_position(key):
+    if "," in key:
+        x, y = key.split(",")
+        return int(x), int(y)
+    return int(key) // 1000, int(key) % 1000
+
+
+def is_tile_file(filename):
+    # scene files describe a map, tile files only hold tiles keyed by position
+    with open(filename) as f:
+        data = json.load(f)
+    return len(data) > 0 and all(key.replace(",", "").isdigit() for key in data.keys())
+
+
+def run_searches(search, grid, queries):
+    expansions = 0
+    found = 0
+    start_time = time.perf_counter()
+    for start, end in queries:
+        stats = {}
+        if len(search(grid, start, end, max_length, stats)) > 0:
+            found += 1
+        expansions += stats["expansions"]
+    return time.perf_counter() - start_time, expansions, found
+
+
+def benchmark(filename):
+    grid = load_grid(filename)
+    walkable_tiles = [grid.tile_coords(i) for i in range(grid.size) if grid.flags[i] & NavFlags.walkable]
+    rng = random.Random(filename)
+    queries = [(rng.choice(walkable_tiles), rng.choice(walkable_tiles)) for i in range(queries_per_map)]
+
+    print(os.path.basename(filename), grid.map_width, "x", grid.map_height, "-", len(walkable_tiles), "walkable tiles")
+    results = {}
+    for name, search in (("A*", pathfinding.find_path), ("JPS", pathfinding.jump_point_search)):
+        seconds, expansions, found = run_searches(search, grid, queries)
+        results[name] = seconds
+        print("    {:4} {:8.1f} ms {:10} expansions {:5} paths found".format(name, seconds * 1000, expansions, found))
+    if results["JPS"] > 0:
+        print("    speedup {:.2f}x".format(results["A*"] / results["JPS"]))
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:]
+    if len(files) == 0:
+        scene_folder = "data/scenes"
+        files = [os.path.join(scene_folder, f) for f in sorted(os.listdir(scene_folder)) if f.endswith(".json")]
+        files = [f for f in files if is_tile_file(f)]
+    for f in files:
+        benchmark(f)
@@ -0,0 +1,234 @@
+from heapq import heappush, heappop
+from navigation import NavFlags
+import pathfinding
+
+
+class PathHierarchy:
+    # splits the map into square clusters of path coordinates, joined by entrances where their borders are open
+    # long searches run over the small graph of entrances and are then refined into tiles inside single clusters
+    cluster_size = 10
+    # an opening at least this wide gets an entrance at both of its ends instead of only its middle
+    wide_entrance = 6
+    # maps with fewer tiles than this are searched directly
+    min_map_tiles = 5000
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.cluster_of = [None] * grid.size
+        self.cluster_tiles = {}
+        for tile_id in range(grid.size):
+            if grid.flags[tile_id] & NavFlags.in_bounds:
+                key = self.cluster_key(grid.tile_coords(tile_id))
+                self.cluster_of[tile_id] = key
+                self.cluster_tiles.setdefault(key, []).append(tile_id)
+
+        # entrances of each border as (tile, tile across) pairs, keyed by the two clusters in sorted order
+        self.transitions = {}
+        # tiles across a border from each entrance
+        self.crossings = {}
+        # costs between the entrances of each cluster: cluster -> {entrance: {entrance: cost}}
+        self.cluster_edges = {}
+        # predecessors of the search inside its cluster from each entrance, used to turn edges back into tiles
+        self.entrance_parents = {}
+        # clusters whose tiles changed since they were last built
+        self.dirty = set(self.cluster_tiles.keys())
+
+    def cluster_key(self, coords):
+        return coords[0] // PathHierarchy.cluster_size, coords[1] // PathHierarchy.cluster_size
+
+    def invalidate(self, coords):
+        # called when a tile changes walkability, the cluster is rebuilt before the next search
+        key = self.cluster_key(coords)
+        if key in self.cluster_tiles:
+            self.dirty.add(key)
+
+    def refresh(self):
+        if len(self.dirty) == 0:
+            return
+        borders = set()
+        for key in self.dirty:
+            for other in [(key[0] + 1, key[1]), (key[0] - 1, key[1]), (key[0], key[1] + 1), (key[0], key[1] - 1)]:
+                if other in self.cluster_tiles:
+                    borders.add((min(key, other), max(key, other)))
+        # entrances on a changed border also change the clusters on its other side
+        changed = set(self.dirty)
+        for border in borders:
+            self.build_border(border)
+            changed.update(border)
+        self.crossings = {}
+        for pairs in self.transitions.values():
+            for a, b in pairs:
+                self.crossings.setdefault(a, []).append(b)
+                self.crossings.setdefault(b, []).append(a)
+        for key in changed:
+            self.build_cluster(key)
+        self.dirty.clear()
+
+    def build_border(self, border):
+        grid = self.grid
+        size = PathHierarchy.cluster_size
+        walkable = NavFlags.walkable
+        first, second = border
+        if first[0] != second[0]:
+            # second cluster is further along x
+            x = second[0] * size
+            lines = [((x - 1, y), (x, y)) for y in range(first[1] * size, first[1] * size + size)]
+        else:
+            y = second[1] * size
+            lines = [((x, y - 1), (x, y)) for x in range(first[0] * size, first[0] * size + size)]
+
+        # group open crossings into runs and place entrances on each run
+        pairs = []
+        run = []
+        for a, b in lines + [(None, None)]:
+            if a is not None and grid.has_flags(a, walkable) and grid.has_flags(b, walkable):
+                run.append((grid.tile_id(a), grid.tile_id(b)))
+            elif len(run) > 0:
+                if len(run) >= PathHierarchy.wide_entrance:
+                    pairs.append(run[0])
+                    pairs.append(run[-1])
+                else:
+                    pairs.append(run[len(run) // 2])
+                run = []
+        self.transitions[border] = pairs
+
+    def build_cluster(self, key):
+        entrances = set()
+        for other in [(key[0] + 1, key[1]), (key[0] - 1, key[1]), (key[0], key[1] + 1), (key[0], key[1] - 1)]:
+            for a, b in self.transitions.get((min(key, other), max(key, other)), []):
+                entrances.add(a if self.cluster_of[a] == key else b)
+        for entrance in self.cluster_edges.get(key, {}):
+            self.entrance_parents.pop(entrance, None)
+        edges = {}
+        for entrance in entrances:
+            costs, parents = self.cluster_search(entrance, key)
+            edges[entrance] = {other: costs[other] for other in entrances if other != entrance and other in costs}
+            self.entrance_parents[entrance] = parents
+        self.cluster_edges[key] = edges
+
+    def cluster_search(self, source, key):
+        # Dijkstra from a tile that never leaves its cluster, with the same movement rules as pathfinding
+        grid = self.grid
+        flags = grid.flags
+        cluster_of = self.cluster_of
+        walkable = NavFlags.walkable
+        costs = {source: 0}
+        parents = {source: -1}
+        open_heap = [(0, source)]
+        closed = set()
+        while open_heap:
+            g_current, current = heappop(open_heap)
+            if current in closed:
+                continue
+            closed.add(current)
+
+            for delta in grid.orthogonal:
+                neighbor = current + delta
+                if neighbor in closed or not flags[neighbor] & walkable or cluster_of[neighbor] != key:
+                    continue
+                g = g_current + 1
+                if neighbor not in costs or g < costs[neighbor]:
+                    costs[neighbor] = g
+                    parents[neighbor] = current
+                    heappush(open_heap, (g, neighbor))
+
+            for delta, side_a, side_b in grid.diagonal:
+                neighbor = current + delta
+                if neighbor in closed or not flags[neighbor] & walkable or cluster_of[neighbor] != key:
+                    continue
+                if not flags[current + side_a] & walkable or not flags[current + side_b] & walkable:
+                    continue
+                g = g_current + 1
+                g += pathfinding.diagonal_cost
+                if neighbor not in costs or g < costs[neighbor]:
+                    costs[neighbor] = g
+                    parents[neighbor] = current
+                    heappush(open_heap, (g, neighbor))
+        return costs, parents
+
+    def find_path(self, start, end, max_length):
+        # returns a list of path coordinates from start to end, which may be slightly longer than the shortest path
+        self.refresh()
+        grid = self.grid
+        walkable = NavFlags.walkable
+        start_id = grid.tile_id(start)
+        end_id = grid.tile_id(end)
+        if start_id < 0 or end_id < 0 or not grid.flags[start_id] & walkable or not grid.flags[end_id] & walkable:
+            return []
+        start_key = self.cluster_of[start_id]
+        end_key = self.cluster_of[end_id]
+
+        # start and end join the entrance graph through searches inside their own clusters
+        start_costs, start_parents = self.cluster_search(start_id, start_key)
+        end_costs, end_parents = self.cluster_search(end_id, end_key)
+        start_edges = {entrance: start_costs[entrance] for entrance in self.cluster_edges[start_key]
+                       if entrance in start_costs}
+
+        g_scores = {start_id: 0}
+        parents = {start_id: (-1, None)}
+        closed = set()
+        open_heap = [(0, 0, start_id)]
+        count = 1
+        while open_heap:
+            f, order, current = heappop(open_heap)
+            if current in closed:
+                continue
+            if current == end_id:
+                return self.refine(parents, end_id, start_parents, end_parents)
+            closed.add(current)
+            g_current = g_scores[current]
+            key = self.cluster_of[current]
+
+            # each edge remembers how it is turned back into tiles
+            if current == start_id:
+                edges = [(node, cost, "start") for node, cost in start_edges.items()]
+            else:
+                edges = [(node, cost, "cluster") for node, cost in self.cluster_edges[key].get(current, {}).items()]
+            for node in self.crossings.get(current, []):
+                edges.append((node, 1, "cross"))
+            if key == end_key and current in end_costs:
+                edges.append((end_id, end_costs[current], "end"))
+
+            for node, cost, kind in edges:
+                if node in closed:
+                    continue
+                g = g_current + cost
+                if g > max_length or (node in g_scores and g >= g_scores[node]):
+                    continue
+                g_scores[node] = g
+                parents[node] = (current, kind)
+                x, y = grid.tile_coords(node)
+                dx = abs(x - end[0])
+                dy = abs(y - end[1])
+                heappush(open_heap, (g + (dx + dy) - 0.586 * min(dx, dy), count, node))
+                count += 1
+        return []
+
+    def refine(self, parents, end_id, start_parents, end_parents):
+        steps = []
+        current = end_id
+        while current != -1:
+            previous, kind = parents[current]
+            steps.append((previous, current, kind))
+            current = previous
+        steps.reverse()
+
+        path = []
+        for previous, current, kind in steps:
+            if kind is None or kind == "cross":
+                path.append(current)
+            elif kind == "start":
+                path += self.walk_back(start_parents, current)[::-1][1:]
+            elif kind == "end":
+                path += self.walk_back(end_parents, previous)[1:]
+            else:
+                path += self.walk_back(self.entrance_parents[previous], current)[::-1][1:]
+        return [self.grid.tile_coords(tile_id) for tile_id in path]
+
+    def walk_back(self, parents, tile_id):
+        # tiles from tile_id back to the source of a cluster search
+        tiles = []
+        while tile_id != -1:
+            tiles.append(tile_id)
+            tile_id = parents[tile_id]
+        return tiles
@@ -0,0 +1,433 @@
+from heapq import heappush, heappop
+from weakref import WeakKeyDictionary
+from navigation import NavFlags
+from tile_set import TileSet
+
+# extra cost of a diagonal step on top of the orthogonal cost of 1
+diagonal_cost = 0.414
+
+
+class DistanceField:
+    # costs and predecessors from a Dijkstra search, kept so ranges and paths can be read without searching again
+    def __init__(self, grid, origins, costs, parents, max_length):
+        self.grid = grid
+        self.origins = origins
+        self.costs = costs
+        self.parents = parents
+        self.max_length = max_length
+
+    def cost(self, coords):
+        # returns None when the tile cannot be reached within max_length
+        return self.costs.get(self.grid.tile_id(coords))
+
+    def tiles_within(self, limit):
+        return TileSet.from_ids(self.grid, [tile_id for tile_id, cost in self.costs.items() if cost <= limit])
+
+    def path_to(self, coords):
+        # walk predecessors back to an origin, returns an empty list for unreachable tiles
+        current = self.grid.tile_id(coords)
+        if current not in self.costs:
+            return []
+        path = []
+        while current != -1:
+            path.append(self.grid.tile_coords(current))
+            current = self.parents[current]
+        return path[::-1]
+
+    def path_from(self, coords, max_length):
+        # follow predecessors from a tile back towards its closest origin, stopping before max_length is exceeded
+        current = self.grid.tile_id(coords)
+        if current not in self.costs:
+            return []
+        path = [self.grid.tile_coords(current)]
+        length = 0
+        current = self.parents[current]
+        while current != -1:
+            step = self.grid.tile_coords(current)
+            if step[0] != path[-1][0] and step[1] != path[-1][1]:
+                length += 1 + diagonal_cost
+            else:
+                length += 1
+            if length > max_length:
+                break
+            path.append(step)
+            current = self.parents[current]
+        return path
+
+
+def distance_field(grid, origins, max_length, mask=NavFlags.walkable):
+    # Dijkstra search outwards from every origin through tiles with the mask flags, until max_length is used up
+    flags = grid.flags
+    costs = {}
+    parents = {}
+    open_heap = []
+    for origin in origins:
+        origin_id = grid.tile_id(origin)
+        if origin_id >= 0:
+            costs[origin_id] = 0
+            parents[origin_id] = -1
+            open_heap.append((0, origin_id))
+    open_heap.sort()
+
+    closed = bytearray(grid.size)
+    while open_heap:
+        g_current, current = heappop(open_heap)
+        if closed[current]:
+            continue
+        closed[current] = 1
+        if g_current + 1 > max_length:
+            continue
+
+        for delta in grid.orthogonal:
+            neighbor = current + delta
+            if closed[neighbor] or not flags[neighbor] & mask:
+                continue
+            g = g_current + 1
+            if neighbor not in costs or g < costs[neighbor]:
+                costs[neighbor] = g
+                parents[neighbor] = current
+                heappush(open_heap, (g, neighbor))
+
+        for delta, side_a, side_b in grid.diagonal:
+            neighbor = current + delta
+            if closed[neighbor] or not flags[neighbor] & mask:
+                continue
+            g = g_current + 1
+            g += diagonal_cost
+            # a tile on either side blocks diagonal movement
+            if g > max_length or not flags[current + side_a] & mask or not flags[current + side_b] & mask:
+                continue
+            if neighbor not in costs or g < costs[neighbor]:
+                costs[neighbor] = g
+                parents[neighbor] = current
+                heappush(open_heap, (g, neighbor))
+
+    origins = tuple((origin[0], origin[1]) for origin in origins)
+    return DistanceField(grid, origins, costs, parents, max_length)
+
+
+def find_path(grid, start, end, max_length, stats=None):
+    # A* search over the ids of a NavGrid, returns a list of path coordinates from start to end
+    # pass a dict as stats to get the number of expanded nodes back
+    start_id = grid.tile_id(start)
+    end_id = grid.tile_id(end)
+    walkable = NavFlags.walkable
+    flags = grid.flags
+    if start_id < 0 or end_id < 0 or not flags[end_id] & walkable:
+        return []
+
+    stride = grid.stride
+    padding = grid.padding
+    end_x = end[0]
+    end_y = end[1]
+
+    closed = bytearray(grid.size)
+    g_scores = {start_id: 0}
+    f_scores = {start_id: 0}
+    parents = {start_id: -1}
+    # ties on f are broken by the order a node was first opened
+    open_order = {start_id: 0}
+    open_heap = [(0, 0, start_id)]
+    expanded = 0
+
+    while open_heap:
+        f, order, current = heappop(open_heap)
+        if closed[current] or f != f_scores[current]:
+            # stale entry left behind when a node's score improved
+            continue
+
+        # Found the goal
+        if current == end_id:
+            if stats is not None:
+                stats["expansions"] = expanded
+            path = []
+            while current != -1:
+                path.append(grid.tile_coords(current))
+                current = parents[current]
+            return path[::-1]  # Return reversed path
+
+        closed[current] = 1
+        expanded += 1
+        g_current = g_scores[current]
+        if g_current + 1 > max_length:
+            continue
+
+        for delta in grid.orthogonal:
+            neighbor = current + delta
+            if closed[neighbor] or not flags[neighbor] & walkable:
+                continue
+            g = g_current + 1
+            if neighbor in g_scores and g >= g_scores[neighbor]:
+                continue
+            order = open_order.setdefault(neighbor, len(open_order))
+            f = g + _heuristic(neighbor, stride, padding, end_x, end_y)
+            g_scores[neighbor] = g
+            f_scores[neighbor] = f
+            parents[neighbor] = current
+            heappush(open_heap, (f, order, neighbor))
+
+        for delta, side_a, side_b in grid.diagonal:
+            neighbor = current + delta
+            if closed[neighbor] or not flags[neighbor] & walkable:
+                continue
+            g = g_current + 1
+            g += diagonal_cost
+            # a tile on either side blocks diagonal movement
+            if g > max_length or not flags[current + side_a] & walkable or not flags[current + side_b] & walkable:
+                continue
+            if neighbor in g_scores and g >= g_scores[neighbor]:
+                continue
+            order = open_order.setdefault(neighbor, len(open_order))
+            f = g + _heuristic(neighbor, stride, padding, end_x, end_y)
+            g_scores[neighbor] = g
+            f_scores[neighbor] = f
+            parents[neighbor] = current
+            heappush(open_heap, (f, order, neighbor))
+    if stats is not None:
+        stats["expansions"] = expanded
+    return []
+
+
+def _heuristic(tile_id, stride, padding, end_x, end_y):
+    u = tile_id // stride - padding
+    v = tile_id % stride - padding
+    x = (u + v) // 2
+    y = (u - v) // 2
+    dx = abs(x - end_x)
+    dy = abs(y - end_y)
+    # deterministically alter predicted distance to break ties and improve performance
+    hashed = 1000 * x + y
+    return ((dx + dy) - 0.586 * min(dx, dy)) * (1 + hashed / 100000)
+
+
+class JumpTable:
+    # result of a straight jump from every tile in each straight direction, so jumps become lookups
+    # a value j >= 0 means the jump stops j steps ahead, -(n + 1) means it hits a wall after n walkable tiles
+    def __init__(self, grid):
+        self.version = grid.version
+        self.straight = {}
+        flags = grid.flags
+        walkable = NavFlags.walkable
+        for direction, sides in (((1, 0), (0, 1)), ((-1, 0), (0, 1)), ((0, 1), (1, 0)), ((0, -1), (1, 0))):
+            step = grid.delta(direction)
+            side_a = grid.delta(sides)
+            side_b = -side_a
+            table = [-1] * grid.size
+            # fill tiles in the opposite order of the step, so the tile ahead is always known
+            if step > 0:
+                ids = range(grid.size - 1 - step, -1, -1)
+            else:
+                ids = range(-step, grid.size)
+            for node in ids:
+                if not flags[node] & walkable:
+                    continue
+                if (flags[node + side_a] & walkable and not flags[node - step + side_a] & walkable) \
+                        or (flags[node + side_b] & walkable and not flags[node - step + side_b] & walkable):
+                    # a wall corner opens up a side tile that could not be reached before
+                    table[node] = 0
+                elif table[node + step] >= 0:
+                    table[node] = table[node + step] + 1
+                else:
+                    table[node] = table[node + step] - 1
+            self.straight[direction] = (step, table)
+
+
+_jump_tables = WeakKeyDictionary()
+
+
+def get_jump_table(grid):
+    table = _jump_tables.get(grid)
+    if table is None or table.version != grid.version:
+        table = JumpTable(grid)
+        _jump_tables[grid] = table
+    return table
+
+
+def jump_point_search(grid, start, end, max_length, stats=None):
+    # A* that only stops on jump points, tiles where the best path may turn, instead of every open tile
+    # uses the same movement rules as find_path, diagonal moves are blocked when either side tile is unwalkable
+    start_id = grid.tile_id(start)
+    end_id = grid.tile_id(end)
+    walkable = NavFlags.walkable
+    flags = grid.flags
+    if start_id < 0 or end_id < 0 or not flags[start_id] & walkable or not flags[end_id] & walkable:
+        return []
+
+    straight = get_jump_table(grid).straight
+    end_x = end[0]
+    end_y = end[1]
+    directions = {}
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            if dx != 0 or dy != 0:
+                directions[(dx, dy)] = grid.delta((dx, dy))
+
+    closed = bytearray(grid.size)
+    g_scores = {start_id: 0}
+    parents = {start_id: -1}
+    # direction of the jump that reached each node, None for the start
+    arrived = {start_id: None}
+    open_heap = [(0, 0, start_id)]
+    count = 1
+    expanded = 0
+
+    while open_heap:
+        f, order, current = heappop(open_heap)
+        if closed[current]:
+            continue
+
+        if current == end_id:
+            if stats is not None:
+                stats["expansions"] = expanded
+            return _expand_jumps(grid, parents, end_id)
+
+        closed[current] = 1
+        expanded += 1
+        g_current = g_scores[current]
+        if g_current + 1 > max_length:
+            continue
+
+        for direction in _pruned_directions(flags, current, arrived[current], directions):
+            node = current + directions[direction]
+            if direction[0] != 0 and direction[1] != 0:
+                jump = _jump_diagonal(flags, node, directions[direction], straight[(direction[0], 0)],
+                                      straight[(0, direction[1])], end_id)
+            else:
+                jump = _jump_straight(node, straight[direction], end_id)
+            if jump < 0 or closed[jump]:
+                continue
+            # every jump is a straight or diagonal line, so its cost is added one step at a time like find_path
+            g = g_current
+            steps = _line_steps(grid, current, jump)
+            if direction[0] != 0 and direction[1] != 0:
+                for i in range(steps):
+                    g = g + 1
+                    g += diagonal_cost
+            else:
+                g += steps
+            if g > max_length or (jump in g_scores and g >= g_scores[jump]):
+                continue
+            g_scores[jump] = g
+            parents[jump] = current
+            arrived[jump] = direction
+            x, y = grid.tile_coords(jump)
+            dx = abs(x - end_x)
+            dy = abs(y - end_y)
+            heappush(open_heap, (g + (dx + dy) - 0.586 * min(dx, dy), count, jump))
+            count += 1
+    if stats is not None:
+        stats["expansions"] = expanded
+    return []
+
+
+def _pruned_directions(flags, current, direction, directions):
+    # directions worth searching from a jump point, given the direction it was reached from
+    walkable = NavFlags.walkable
+    if direction is None:
+        result = []
+        for (dx, dy), delta in directions.items():
+            if not flags[current + delta] & walkable:
+                continue
+            if dx != 0 and dy != 0 and not (flags[current + directions[(dx, 0)]] & walkable
+                                            and flags[current + directions[(0, dy)]] & walkable):
+                continue
+            result.append((dx, dy))
+        return result
+
+    dx, dy = direction
+    result = []
+    if dx != 0 and dy != 0:
+        horizontal = flags[current + directions[(dx, 0)]] & walkable
+        vertical = flags[current + directions[(0, dy)]] & walkable
+        if vertical:
+            result.append((0, dy))
+        if horizontal:
+            result.append((dx, 0))
+        if horizontal and vertical:
+            result.append((dx, dy))
+    elif dx != 0:
+        ahead = flags[current + directions[(dx, 0)]] & walkable
+        side_a = flags[current + directions[(0, 1)]] & walkable
+        side_b = flags[current + directions[(0, -1)]] & walkable
+        if ahead:
+            result.append((dx, 0))
+            if side_a:
+                result.append((dx, 1))
+            if side_b:
+                result.append((dx, -1))
+        if side_a:
+            result.append((0, 1))
+        if side_b:
+            result.append((0, -1))
+    else:
+        ahead = flags[current + directions[(0, dy)]] & walkable
+        side_a = flags[current + directions[(1, 0)]] & walkable
+        side_b = flags[current + directions[(-1, 0)]] & walkable
+        if ahead:
+            result.append((0, dy))
+            if side_a:
+                result.append((1, dy))
+            if side_b:
+                result.append((-1, dy))
+        if side_a:
+            result.append((1, 0))
+        if side_b:
+            result.append((-1, 0))
+    return result
+
+
+def _jump_straight(node, straight, end_id):
+    # returns the next jump point in a straight line from node, or -1 when the line runs into a wall
+    step, table = straight
+    reach = table[node]
+    # the goal is also a jump point when it lies on the line before the jump stops
+    offset = end_id - node
+    if offset % step == 0:
+        ahead = offset // step
+        if 0 <= ahead and (ahead <= reach or ahead < -reach - 1):
+            return end_id
+    if reach >= 0:
+        return node + reach * step
+    return -1
+
+
+def _jump_diagonal(flags, node, step, straight_x, straight_y, end_id):
+    walkable = NavFlags.walkable
+    step_x = straight_x[0]
+    step_y = straight_y[0]
+    while flags[node] & walkable:
+        if node == end_id:
+            return node
+        # a diagonal stops wherever one of its straight parts would find a jump point
+        if _jump_straight(node + step_x, straight_x, end_id) >= 0 \
+                or _jump_straight(node + step_y, straight_y, end_id) >= 0:
+            return node
+        if not flags[node + step_x] & walkable or not flags[node + step_y] & walkable:
+            return -1
+        node += step
+    return -1
+
+
+def _line_steps(grid, start_id, end_id):
+    start_x, start_y = grid.tile_coords(start_id)
+    end_x, end_y = grid.tile_coords(end_id)
+    return max(abs(end_x - start_x), abs(end_y - start_y))
+
+
+def _expand_jumps(grid, parents, end_id):
+    # fill in the tiles between jump points, characters walk paths one tile at a time
+    jumps = []
+    current = end_id
+    while current != -1:
+        jumps.append(grid.tile_coords(current))
+        current = parents[current]
+    jumps.reverse()
+
+    path = [jumps[0]]
+    for x, y in jumps[1:]:
+        prev_x, prev_y = path[-1]
+        step_x = (x > prev_x) - (x < prev_x)
+        step_y = (y > prev_y) - (y < prev_y)
+        while path[-1] != (x, y):
+            path.append((path[-1][0] + step_x, path[-1][1] + step_y))
+    return path
@@ -0,0 +1,148 @@
+import json
+import os
+import time
+import pygame
+import compositor
+import fonts
+from collections import deque
+
+
+class Profiler:
+    # seconds spent in each named scope for the last frames, newest last
+    # a scope entered more than once in a frame adds up, scopes inside other scopes are counted in both
+    enabled = False
+    frame_count = 600
+    frames = deque(maxlen=frame_count)
+    current = {}
+    frame_start = 0.0
+    # scope names in the order they were first seen, so the overlay and dumps keep a stable layout
+    names = []
+    dump_folder = "data/profiles"
+
+
+class Overlay:
+    # graph of recent frame times with percentiles of each scope, rebuilt every few frames
+    size = (420, 360)
+    graph_height = 100
+    refresh_frames = 15
+    percentiles = (50, 95, 99)
+    image = None
+    age = 0
+
+
+class Scope:
+    def __init__(self, name):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        if Profiler.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if Profiler.enabled:
+            add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def scope(name):
+    # with profiler.scope("name"): times the block into the current frame
+    return Scope(name)
+
+
+def add_time(name, seconds):
+    if name not in Profiler.current:
+        Profiler.current[name] = 0.0
+        if name not in Profiler.names:
+            Profiler.names.append(name)
+    Profiler.current[name] += seconds
+
+
+def set_enabled(enabled):
+    Profiler.enabled = enabled
+    Profiler.current = {}
+    Profiler.frame_start = time.perf_counter()
+
+
+def end_frame():
+    # stores the scopes timed since the last call along with the whole frame's time, then starts the next frame
+    if not Profiler.enabled:
+        return
+    now = time.perf_counter()
+    Profiler.current["frame"] = now - Profiler.frame_start
+    if "frame" not in Profiler.names:
+        Profiler.names.insert(0, "frame")
+    Profiler.frames.append(Profiler.current)
+    Profiler.current = {}
+    Profiler.frame_start = now
+
+
+def percentile(name, percent):
+    # in seconds over the stored frames, frames where the scope did not run count as zero
+    times = sorted(frame.get(name, 0.0) for frame in Profiler.frames)
+    if len(times) == 0:
+        return 0.0
+    return times[min(len(times) - 1, int(len(times) * percent / 100))]
+
+
+def render_overlay(screen):
+    if Overlay.image is None or Overlay.age >= Overlay.refresh_frames:
+        build_overlay()
+        Overlay.age = 0
+    Overlay.age += 1
+    screen.blit(Overlay.image, (screen.get_width() - Overlay.size[0], 0))
+
+
+def build_overlay():
+    if Overlay.image is None:
+        Overlay.image = pygame.Surface(Overlay.size).convert()
+        Overlay.image.set_alpha(200)
+    image = Overlay.image
+    image.fill((20, 20, 40))
+    width, height = Overlay.size
+    graph_height = Overlay.graph_height
+
+    # one bar per stored frame, scaled so two 60 fps frames fill the graph, with a line at one 60 fps frame
+    budget = 1 / 60
+    frames = list(Profiler.frames)[-width:]
+    for i, frame in enumerate(frames):
+        seconds = frame.get("frame", 0.0)
+        bar = min(graph_height, round(seconds / budget / 2 * graph_height))
+        color = (90, 200, 90) if seconds <= budget else (220, 80, 60)
+        image.fill(color, (width - len(frames) + i, graph_height - bar, 1, bar))
+    image.fill((200, 200, 200), (0, graph_height // 2, width, 1))
+
+    font = fonts.get_font(None, 24)
+    line_height = font.get_linesize()
+    y = graph_height + 4
+    columns = [4] + [160 + i * 80 for i in range(len(Overlay.percentiles))]
+    row = ["ms"] + ["p" + str(p) for p in Overlay.percentiles]
+    for name in [None] + Profiler.names:
+        if y + line_height > height:
+            break
+        if name is not None:
+            row = [name] + ["{:.2f}".format(percentile(name, p) * 1000) for p in Overlay.percentiles]
+        for x, text in zip(columns, row):
+            image.blit(font.render(text, True, pygame.Color("white")), (x, y))
+        y += line_height
+    compositor.changed(image)
+
+
+def dump(path=None):
+    # writes the stored frames as csv and json, one row per frame in milliseconds, and returns the paths written
+    if path is None:
+        os.makedirs(Profiler.dump_folder, exist_ok=True)
+        path = os.path.join(Profiler.dump_folder, time.strftime("profile_%Y%m%d_%H%M%S"))
+    frames = [{name: frame.get(name, 0.0) * 1000 for name in Profiler.names} for frame in Profiler.frames]
+
+    with open(path + ".csv", "w") as csv_file:
+        csv_file.write(",".join(Profiler.names) + "\n")
+        for frame in frames:
+            csv_file.write(",".join("{:.4f}".format(frame[name]) for name in Profiler.names) + "\n")
+
+    summary = {name: {"p" + str(p): percentile(name, p) * 1000 for p in Overlay.percentiles}
+               for name in Profiler.names}
+    with open(path + ".json", "w") as json_file:
+        json.dump({"percentiles": summary, "frames": frames}, json_file)
+    return [path + ".csv", path + ".json"]
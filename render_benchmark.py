@@ -0,0 +1,204 @@
+import json
+import os
+import random
+import shutil
+import sys
+import time
+
+# measures map rendering on the shipped scenes without opening a window
+# usage: python render_benchmark.py [--output results.json] [scene files...]
+# prints a json summary of each scene, --output also writes every frame's timings
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+import pygame
+import alchemy_settings as a_settings
+import compositor
+
+# the game writes the save file on start, tilemap reads it when imported
+if not os.path.exists("data/saves/save_data.json"):
+    shutil.copyfile("data/saves/default_save_data.json", "data/saves/save_data.json")
+# imported in the same order as the game so their circular imports resolve
+import game_modes
+import game_state
+import tilemap
+
+pan_frames = 120
+pan_speed = 12
+zoom_min = 0.6
+zoom_max = 1
+zoom_step = 0.05
+hover_frames = 120
+
+
+def setup():
+    pygame.mixer.pre_init()
+    pygame.init()
+    pygame.display.set_mode((a_settings.display_width, a_settings.display_height))
+
+
+def is_scene_file(filename):
+    # tile files only hold tiles keyed by position, scene files name a map file and tile sheet
+    with open(filename) as f:
+        data = json.load(f)
+    return "map file" in data and "tile sheet" in data
+
+
+def load_map(filename):
+    # the hub is the only scene with menus and is walked around in, every other scene is a battle
+    with open(filename) as f:
+        data = json.load(f)
+    tilemap.Camera.zoom = 1
+    # scenes with players fill the party, which would otherwise carry over into the next scene
+    game_state.GameState.player_characters.clear()
+    random.seed(filename)
+    if "menus" in data:
+        return tilemap.FreeMoveMap(filename)
+    tile_map = tilemap.CombatMap(filename)
+    # normally set by the first update, which would also start the battle
+    tile_map.mouse_coords = tilemap.screen_to_path(pygame.mouse.get_pos())
+    return tile_map
+
+
+class FrameTimer:
+    def __init__(self, screen):
+        self.screen = screen
+        self.frames = []
+
+    def frame(self, tile_map, phase, timings=None):
+        # renders and presents one frame, timings holds anything measured before it in milliseconds
+        row = {"phase": phase}
+        if timings is not None:
+            row.update(timings)
+        if hasattr(tile_map, "get_tint_draws"):
+            start = time.perf_counter()
+            tile_map.get_tint_draws()
+            row["get_tint_draws"] = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        tile_map.render(self.screen)
+        row["render"] = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        regions = self.screen.present()
+        pygame.display.update(regions)
+        row["present"] = (time.perf_counter() - start) * 1000
+        row["regions"] = len(regions)
+        self.frames.append(row)
+
+
+def run_pan(tile_map, timer):
+    # sweeps the camera right and down then back, keeping it over the map like the game does
+    camera = tilemap.Camera
+    for i in range(pan_frames):
+        direction = 1 if i < pan_frames // 2 else -1
+        camera.pos[0] -= pan_speed * direction
+        camera.pos[1] -= pan_speed / 2 * direction
+        tile_map.move_camera_in_bounds()
+        timer.frame(tile_map, "pan")
+
+
+def run_zoom(tile_map, timer):
+    # steps through every zoom level the zoom keys reach, out and back in
+    steps = round((zoom_max - zoom_min) / zoom_step)
+    levels = [round(zoom_max - zoom_step * i, 2) for i in range(steps + 1)]
+    for zoom in levels + levels[::-1]:
+        tilemap.Camera.zoom = zoom
+        start = time.perf_counter()
+        tile_map.zoom_background()
+        timings = {"zoom": zoom, "zoom_background": (time.perf_counter() - start) * 1000}
+        tile_map.tint_layer_update = True
+        tile_map.move_camera_in_bounds()
+        timer.frame(tile_map, "zoom", timings)
+    tilemap.Camera.zoom = 1
+    tile_map.zoom_background()
+
+
+def run_hover(tile_map, timer):
+    # selects the first player character and moves the hovered tile around its movement range
+    if len(getattr(tile_map, "controlled_characters", [])) == 0:
+        return
+    tile_map.selected_character = tile_map.controlled_characters[0].set_selected(True)
+    position = tile_map.selected_character.position
+    rng = random.Random(len(timer.frames))
+    for i in range(hover_frames):
+        tile_map.mouse_coords = (position[0] + rng.randint(-6, 6), position[1] + rng.randint(-6, 6))
+        tile_map.skill_display_update = True
+        timer.frame(tile_map, "hover")
+
+
+def summarize(frames):
+    # mean, median, 95th percentile and worst of every timing, for each phase
+    summary = {}
+    for phase in sorted(set(row["phase"] for row in frames)):
+        rows = [row for row in frames if row["phase"] == phase]
+        summary[phase] = {"frames": len(rows)}
+        for key in ("render", "present", "get_tint_draws", "zoom_background"):
+            values = sorted(row[key] for row in rows if key in row)
+            if len(values) == 0:
+                continue
+            summary[phase][key] = {
+                "mean": sum(values) / len(values),
+                "p50": values[len(values) // 2],
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max": values[-1]
+            }
+    return summary
+
+
+def benchmark(filename):
+    # a scene that cannot be loaded or rendered is reported and the run moves on to the next one
+    try:
+        return run_scene(filename)
+    except Exception as error:
+        return {"error": "{}: {}".format(type(error).__name__, error)}
+
+
+def run_scene(filename):
+    start = time.perf_counter()
+    tile_map = load_map(filename)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    screen = compositor.get_screen()
+    compositor.redraw_all()
+    timer = FrameTimer(screen)
+    # first frame scales and caches everything, it is timed on its own
+    timer.frame(tile_map, "first")
+    run_pan(tile_map, timer)
+    run_zoom(tile_map, timer)
+    run_hover(tile_map, timer)
+    return {
+        "map": type(tile_map).__name__,
+        "load": load_ms,
+        "summary": summarize(timer.frames),
+        "frames": timer.frames
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    output = None
+    if "--output" in args:
+        index = args.index("--output")
+        output = args[index + 1]
+        del args[index:index + 2]
+    files = args
+    if len(files) == 0:
+        scene_folder = "data/scenes"
+        files = [os.path.join(scene_folder, f) for f in sorted(os.listdir(scene_folder)) if f.endswith(".json")]
+        files = [f for f in files if is_scene_file(f)]
+
+    setup()
+    results = {
+        "display": [a_settings.display_width, a_settings.display_height],
+        "pygame": pygame.version.ver,
+        "scenes": {}
+    }
+    for f in files:
+        results["scenes"][os.path.basename(f)] = benchmark(f)
+
+    if output is not None:
+        with open(output, "w") as output_file:
+            json.dump(results, output_file, indent=1)
+    summary = {name: {key: value for key, value in result.items() if key != "frames"}
+               for name, result in results["scenes"].items()}
+    print(json.dumps(summary, indent=1))
+    pygame.quit()
@@ -73,6 +73,7 @@ class DialogueScene(Scene):
                 if move["character"] == c.name:
                     c.path = move["path"]
                     c.position = move["path"][-1]
+                    self.current_map.update_occupancy(c)
 
         if self.dialogue.repeat:
             self.dialogue.repeat = False
@@ -5,6 +5,8 @@ from status_effects import EffectKeys
 from status_effects import effect_list
 import pygame
 import tilemap
+import compositor
+import assets
 
 
 class SkillKeys:
@@ -71,20 +73,20 @@ class Skill:
         if self.has_attribute(SkillKeys.accuracy):
             self.accuracy = skill_data[SkillKeys.accuracy]
 
-        self.sound = pygame.mixer.Sound("game_sounds/defaultSound.wav")
+        self.sound = assets.sound("game_sounds/defaultSound.wav")
         if self.has_attribute(SkillKeys.sound):
-            self.sound = pygame.mixer.Sound(skill_data[SkillKeys.sound])
+            self.sound = assets.sound(skill_data[SkillKeys.sound])
 
         self.tags = skill_data[SkillKeys.tags]
         self.is_buff = self.has_tag(SkillTags.buff)
         self.friendly_fire = self.has_tag(SkillTags.friendly_fire)
 
-        self.cached_valid_tiles = set()
+        self.cached_valid_tiles = self.current_map.tile_set()
         self.cached_position = [-1, -1]
 
         appearance = "images/icons/skill_icon.png"
         # TODO: Get skill image file from json
-        self.appearance = pygame.image.load(appearance)
+        self.appearance = assets.image(appearance)
         self.duration = 300
         self.age = 0
         self.skill_location = None
@@ -129,16 +131,16 @@ class Skill:
                 if self.is_valid_tile(tile_pos):
                     return self.get_area(tile_pos)
             else:
-                potential_targets = set()
+                potential_targets = self.current_map.tile_set()
                 target_ally = self.is_buff
                 if not self.user.ally:
                     target_ally = not target_ally
-                for e in self.current_map.character_list:
-                    if e.ally == target_ally and tuple(e.position) in self.targetable_tiles():
+                for e in self.current_map.get_characters_in_set(self.targetable_tiles()):
+                    if e.ally == target_ally:
                         potential_targets.add((e.position[0], e.position[1]))
                         e.show_hit_chance(self)
                 return potential_targets
-        return set()
+        return self.current_map.tile_set()
 
     def get_area(self, tile_pos):
         return self.current_map.find_all_paths(tile_pos, self.area, True, indirect=self.has_tag(SkillTags.indirect))
@@ -222,6 +224,7 @@ class ChainedSkill(Skill):
     def exec_skill(self, tile_pos):
         if self.can_use_skill() and self.is_valid_tile(tile_pos):
             screen = pygame.display.get_surface()
+            compositor.redraw_all()
             get_target = True
             while get_target:
                 pygame.time.wait(3)
@@ -303,19 +306,18 @@ class MoveSkill(Skill):
     def attack_targets(self, tile_pos):
         self.user.position = tile_pos
         self.user.path = [self.user.position, tile_pos]
+        self.current_map.update_occupancy(self.user)
 
     def targetable_tiles(self, display=False):
         tiles_in_range = self.current_map.find_all_paths(self.user.position, self.range, False, display)
-        for c in self.current_map.character_list:
-            tiles_in_range.discard((c.position[0], c.position[1]))
-        return tiles_in_range
+        return tiles_in_range - self.current_map.occupied_tiles()
 
 
 @skill
 class Sweep(Skill):
     def get_area(self, tile_pos):
-        area = set()
-        area.add(tuple(tile_pos))
+        area = self.current_map.tile_set()
+        area.add(tile_pos)
         # return the clicked position and the two closest adjacent tiles
         difference = (self.user.position[0] - tile_pos[0], self.user.position[1] - tile_pos[1])
         if difference[0] != 0 and difference[1] != 0:
@@ -336,10 +338,10 @@ class Sweep(Skill):
 @skill
 class Respite(Skill):
     def display_targets(self, tile_pos):
-        targets = set()
+        targets = self.current_map.tile_set()
         for c in self.current_map.character_list:
             if c.ally == self.user.ally:
-                targets.add(tuple(c.position))
+                targets.add(c.position)
         return targets
 
     def target(self, tile_pos):
@@ -375,3 +377,4 @@ class Throw(ChainedSkill):
 
             throw_target.position = self.second_target
             throw_target.visual_position = self.second_target
+            self.current_map.update_occupancy(throw_target)
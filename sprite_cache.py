@@ -0,0 +1,47 @@
+import pygame
+from collections import OrderedDict
+
+
+class SpriteCache:
+    # scaled copies of images for each zoom level, so an image is only rescaled the first time it is drawn at a zoom
+    # least recently used copies are dropped once their pixels take up more than max_bytes
+    max_bytes = 64 * 1024 * 1024
+
+    def __init__(self):
+        # (source id, zoom) -> (source, scaled copy), the source is kept so its id cannot be reused while cached
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def scaled(self, image, zoom):
+        if zoom == 1:
+            return image
+        key = (id(image), zoom)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][1]
+
+        self.misses += 1
+        zoomed = pygame.transform.scale(image, (round(image.get_width() * zoom), round(image.get_height() * zoom)))
+        self.entries[key] = (image, zoomed)
+        self.total_bytes += surface_bytes(zoomed)
+        while self.total_bytes > SpriteCache.max_bytes and len(self.entries) > 1:
+            self.total_bytes -= surface_bytes(self.entries.popitem(last=False)[1][1])
+        return zoomed
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+
+def surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+sprites = SpriteCache()
+
+
+def scaled(image, zoom):
+    return sprites.scaled(image, zoom)
@@ -0,0 +1,102 @@
+from field_of_view import ray
+from tile_set import TileSet
+
+
+class Stencil:
+    # the tiles an area covers around its center when nothing is in the way, stored as offsets
+    # support holds every offset that has to be open for a real area to match, including tiles crossed by sight lines
+    def __init__(self, offsets, support):
+        self.offsets = tuple(offsets)
+        self.support = tuple(support)
+        self.reach = max(abs(dx) + abs(dy) for dx, dy in self.support)
+        # offsets as bitboards per grid stride, shifted so the lowest id difference lands on bit 0
+        self.boards = {}
+
+    def grid_boards(self, grid):
+        if grid.stride not in self.boards:
+            base = -min(grid.delta(offset) for offset in self.support)
+            offset_bits = 0
+            for offset in self.offsets:
+                offset_bits |= 1 << (grid.delta(offset) + base)
+            support_bits = 0
+            for offset in self.support:
+                support_bits |= 1 << (grid.delta(offset) + base)
+            self.boards[grid.stride] = (base, offset_bits, support_bits)
+        return self.boards[grid.stride]
+
+
+def open_flood(radius):
+    # the same first come flood as CombatMap.find_all_paths, run on open ground
+    steps = [((0, -1), 1), ((0, 1), 1), ((-1, 0), 1), ((1, 0), 1),
+             ((-1, -1), 1.414), ((-1, 1), 1.414), ((1, -1), 1.414), ((1, 1), 1.414)]
+    open_list = [((0, 0), 0)]
+    seen = {(0, 0)}
+    closed_index = 0
+    while closed_index < len(open_list):
+        current, current_g = open_list[closed_index]
+        closed_index += 1
+        if current_g + 1 > radius:
+            continue
+        for step, cost in steps:
+            node = (current[0] + step[0], current[1] + step[1])
+            if node in seen:
+                continue
+            g = current_g + 1
+            if cost > 1:
+                g += 0.414
+                if g > radius:
+                    continue
+            open_list.append((node, g))
+            seen.add(node)
+    return [node for node, g in open_list]
+
+
+_stencils = {}
+
+
+def get_area_stencil(radius, sight):
+    key = ("area", radius, sight)
+    if key not in _stencils:
+        offsets = open_flood(radius)
+        support = set(offsets)
+        if sight:
+            for offset in offsets:
+                support.update(ray(offset))
+        _stencils[key] = Stencil(offsets, support)
+    return _stencils[key]
+
+
+def get_radius_stencil(radius):
+    # tiles within radius orthogonal steps
+    key = ("radius", radius)
+    if key not in _stencils:
+        offsets = [(dx, dy) for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1)
+                   if abs(dx) + abs(dy) <= radius]
+        _stencils[key] = Stencil(offsets, offsets)
+    return _stencils[key]
+
+
+def stamp(grid, center, stencil, mask):
+    # the stencil placed on center, or None when a support tile is missing mask flags and the area must be searched
+    center_id = grid.tile_id(center)
+    if center_id < 0:
+        return None
+    x = center[0]
+    y = center[1]
+    u = x + y + grid.padding
+    v = x - y + grid.padding
+    reach = stencil.reach
+    if reach <= u < grid.rows - reach and reach <= v < grid.stride - reach:
+        # the whole stencil lies inside the grid, so it can be checked and placed by shifting its bitboards
+        base, offset_bits, support_bits = stencil.grid_boards(grid)
+        shift = center_id - base
+        if (support_bits << shift) & ~grid.flag_bits(mask):
+            return None
+        return TileSet(grid, bits=offset_bits << shift)
+
+    flags = grid.flags
+    for dx, dy in stencil.support:
+        tile_id = grid.tile_id((x + dx, y + dy))
+        if tile_id < 0 or flags[tile_id] & mask != mask:
+            return None
+    return TileSet(grid, [(x + dx, y + dy) for dx, dy in stencil.offsets])
@@ -2,6 +2,7 @@ import pygame
 import random
 
 import game_state
+import assets
 from tilemap import Camera
 import alchemy_settings as a_settings
 from game_state import GameState
@@ -85,18 +86,15 @@ class PathNode:
 class StrategyMap:
     def __init__(self):
         self.map_icons = {
-            Icon.combat: pygame.image.load("images/icons/combat_icon.png").convert(),
-            Icon.elite_combat: pygame.image.load("images/icons/elite_combat_icon.png").convert(),
-            Icon.important: pygame.image.load("images/icons/important_icon.png").convert(),
-            Icon.loot: pygame.image.load("images/icons/key_icon.png").convert(),
-            Icon.shop: pygame.image.load("images/icons/lock_icon.png").convert(),
-            Icon.mystery: pygame.image.load("images/icons/mystery_icon.png").convert(),
-            Icon.heal: pygame.image.load("images/icons/replenish_icon.png").convert()
+            Icon.combat: assets.image("images/icons/combat_icon.png", colorkey="black"),
+            Icon.elite_combat: assets.image("images/icons/elite_combat_icon.png", colorkey="black"),
+            Icon.important: assets.image("images/icons/important_icon.png", colorkey="black"),
+            Icon.loot: assets.image("images/icons/key_icon.png", colorkey="black"),
+            Icon.shop: assets.image("images/icons/lock_icon.png", colorkey="black"),
+            Icon.mystery: assets.image("images/icons/mystery_icon.png", colorkey="black"),
+            Icon.heal: assets.image("images/icons/replenish_icon.png", colorkey="black")
         }
 
-        for icon in self.map_icons.values():
-            icon.set_colorkey(pygame.Color("black"))
-
         # create map symbol grid
         self.grid_width = 7
         self.grid_height = 12
@@ -0,0 +1,94 @@
+import pygame
+from collections import OrderedDict
+
+
+class TextCache:
+    # wrapped lines keyed on (text, font, width) and rendered lines keyed on (line, font, color, antialias, background)
+    # both drop their least recently used entries past these sizes
+    max_layouts = 512
+    max_lines = 1024
+    layouts = OrderedDict()
+    lines = OrderedDict()
+
+
+def fits(font, text, width):
+    return font.size(text)[0] <= width
+
+
+def longest_fit(font, pieces, joiner, width):
+    # the most pieces from the start whose joined text fits in width, found by binary search since widths only grow
+    low = 0
+    high = len(pieces)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(font, joiner.join(pieces[:middle]), width):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def wrap(text, font, width):
+    # splits text into lines no wider than width, breaking at spaces and newlines
+    # a word too long for a line of its own is broken between letters
+    if text == "":
+        return ()
+    key = (text, font, width)
+    if key in TextCache.layouts:
+        TextCache.layouts.move_to_end(key)
+        return TextCache.layouts[key]
+
+    lines = []
+    for paragraph in text.split("\n"):
+        words = paragraph.split(" ")
+        while len(words) > 0:
+            count = longest_fit(font, words, " ", width)
+            if count == 0:
+                # the first word alone is too wide, keep as many letters as fit but at least one
+                word = words[0]
+                letters = max(1, longest_fit(font, word, "", width))
+                lines.append(word[:letters])
+                words[0] = word[letters:]
+                if len(words[0]) == 0:
+                    words.pop(0)
+            else:
+                lines.append(" ".join(words[:count]))
+                words = words[count:]
+    # a newline at the very end does not start another line
+    if len(lines) > 1 and lines[-1] == "":
+        lines.pop()
+
+    lines = tuple(lines)
+    TextCache.layouts[key] = lines
+    if len(TextCache.layouts) > TextCache.max_layouts:
+        TextCache.layouts.popitem(last=False)
+    return lines
+
+
+def render_line(line, font, color, aa=False, bkg=None):
+    color = tuple(pygame.Color(color))
+    if bkg:
+        bkg = tuple(pygame.Color(bkg))
+    key = (line, font, color, aa, bkg)
+    if key in TextCache.lines:
+        TextCache.lines.move_to_end(key)
+        return TextCache.lines[key]
+
+    if bkg:
+        image = font.render(line, 1, color, bkg)
+        image.set_colorkey(bkg)
+    else:
+        image = font.render(line, aa, color)
+    TextCache.lines[key] = image
+    if len(TextCache.lines) > TextCache.max_lines:
+        TextCache.lines.popitem(last=False)
+    return image
+
+
+def draw_lines(surface, lines, color, position, font, aa=False, bkg=None):
+    line_spacing = -2
+    font_height = font.size("Tg")[1]
+    y = position[1]
+    for line in lines:
+        surface.blit(render_line(line, font, color, aa, bkg), (position[0], y))
+        y += font_height + line_spacing
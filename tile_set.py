@@ -0,0 +1,146 @@
+# bit positions set in each possible byte value, used to walk the bits of a TileSet a byte at a time
+_byte_bits = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+
+
+class TileSet:
+    # a set of path coordinates kept as one bit per tile id of a NavGrid, so unions and differences work on whole words
+    # behaves like a set of (x, y) tuples, tiles outside of the grid cannot be stored and are ignored
+    def __init__(self, grid, tiles=(), bits=0):
+        self.grid = grid
+        self.bits = bits
+        if tiles:
+            self.bits |= self.tiles_to_bits(tiles)
+
+    @classmethod
+    def from_ids(cls, grid, tile_ids):
+        data = bytearray((grid.size + 7) // 8)
+        for tile_id in tile_ids:
+            data[tile_id >> 3] |= 1 << (tile_id & 7)
+        return cls(grid, bits=int.from_bytes(data, "little"))
+
+    def tiles_to_bits(self, tiles):
+        if isinstance(tiles, TileSet):
+            return tiles.bits
+        grid = self.grid
+        data = bytearray((grid.size + 7) // 8)
+        for tile in tiles:
+            tile_id = grid.tile_id(tile)
+            if tile_id >= 0:
+                data[tile_id >> 3] |= 1 << (tile_id & 7)
+        return int.from_bytes(data, "little")
+
+    def ids(self):
+        data = self.bits.to_bytes((self.grid.size + 7) // 8, "little")
+        for index, value in enumerate(data):
+            if value:
+                base = index << 3
+                for bit in _byte_bits[value]:
+                    yield base + bit
+
+    def __iter__(self):
+        tile_coords = self.grid.tile_coords
+        for tile_id in self.ids():
+            yield tile_coords(tile_id)
+
+    def __len__(self):
+        return bin(self.bits).count("1")
+
+    def __bool__(self):
+        return self.bits != 0
+
+    def __contains__(self, tile):
+        tile_id = self.grid.tile_id(tile)
+        return tile_id >= 0 and self.bits >> tile_id & 1 == 1
+
+    def __eq__(self, other):
+        if isinstance(other, TileSet):
+            return self.bits == other.bits
+        if isinstance(other, (set, frozenset)):
+            return len(self) == len(other) and all(tile in self for tile in other)
+        return NotImplemented
+
+    def __repr__(self):
+        return "TileSet(" + repr(set(self)) + ")"
+
+    def copy(self):
+        return TileSet(self.grid, bits=self.bits)
+
+    def add(self, tile):
+        tile_id = self.grid.tile_id(tile)
+        if tile_id >= 0:
+            self.bits |= 1 << tile_id
+
+    def discard(self, tile):
+        tile_id = self.grid.tile_id(tile)
+        if tile_id >= 0:
+            self.bits &= ~(1 << tile_id)
+
+    def clear(self):
+        self.bits = 0
+
+    def __or__(self, other):
+        return TileSet(self.grid, bits=self.bits | self.tiles_to_bits(other))
+
+    def __and__(self, other):
+        return TileSet(self.grid, bits=self.bits & self.tiles_to_bits(other))
+
+    def __sub__(self, other):
+        return TileSet(self.grid, bits=self.bits & ~self.tiles_to_bits(other))
+
+    def __xor__(self, other):
+        return TileSet(self.grid, bits=self.bits ^ self.tiles_to_bits(other))
+
+    def __rsub__(self, other):
+        return TileSet(self.grid, bits=self.tiles_to_bits(other) & ~self.bits)
+
+    __ror__ = __or__
+    __rand__ = __and__
+    __rxor__ = __xor__
+
+    def __ior__(self, other):
+        self.bits |= self.tiles_to_bits(other)
+        return self
+
+    def __iand__(self, other):
+        self.bits &= self.tiles_to_bits(other)
+        return self
+
+    def __isub__(self, other):
+        self.bits &= ~self.tiles_to_bits(other)
+        return self
+
+    def __ixor__(self, other):
+        self.bits ^= self.tiles_to_bits(other)
+        return self
+
+    def union(self, *others):
+        result = self.copy()
+        for other in others:
+            result |= other
+        return result
+
+    def intersection(self, *others):
+        result = self.copy()
+        for other in others:
+            result &= other
+        return result
+
+    def difference(self, *others):
+        result = self.copy()
+        for other in others:
+            result -= other
+        return result
+
+    def symmetric_difference(self, other):
+        return self ^ other
+
+    def update(self, *others):
+        for other in others:
+            self |= other
+
+    def difference_update(self, *others):
+        for other in others:
+            self -= other
+
+    def issubset(self, other):
+        return self.bits & ~self.tiles_to_bits(other) == 0
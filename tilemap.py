@@ -7,9 +7,23 @@ import character
 import alchemy_settings as a_settings
 import ai_manager
 import user_interface
+import navigation
+from navigation import NavFlags
+import pathfinding
+import path_hierarchy
+import stencils
+from tile_set import TileSet
+import field_of_view
+import compositor
+import sprite_cache
+import occlusion
+import assets
+import profiler
+from background import ChunkedBackground
 import math
 import json
 import random
+from collections import OrderedDict
 
 tile_extent = (64, 32)
 
@@ -107,75 +121,6 @@ def distance_between(p0, p1):
     return (dx + dy) - 0.586 * min(dx, dy)
 
 
-def supercover_line(p0, p1):
-    dx = p1[0] - p0[0]
-    dy = p1[1] - p0[1]
-    nx = abs(dx)
-    ny = abs(dy)
-
-    if dx == 0:
-        points = []
-        for pos in range(ny):
-            points.append([p0[0], min(p0[1], p1[1]) + pos])
-        return points
-    elif dx > 0:
-        sign_x = 1
-    else:
-        sign_x = -1
-
-    if dy == 0:
-        points = []
-        for pos in range(nx):
-            points.append([min(p0[0], p1[0]) + pos, p0[1]])
-        return points
-    elif dy > 0:
-        sign_y = 1
-    else:
-        sign_y = -1
-
-    p = [p0[0], p0[1]]
-    points = [[p[0], p[1]]]
-    ix = 0
-    iy = 0
-    while ix < nx or iy < ny:
-        if (0.5 + ix) / nx == (0.5 + iy) / ny:
-            # next step is diagonal
-            p[0] += sign_x
-            p[1] += sign_y
-            ix += 1
-            iy += 1
-        elif (0.5 + ix) / nx < (0.5 + iy) / ny:
-            # next step is horizontal
-            p[0] += sign_x
-            ix += 1
-        else:
-            # next step is vertical
-            p[1] += sign_y
-            iy += 1
-        points.append((p[0], p[1]))
-    return points
-
-
-class Node:
-
-    def __init__(self, parent=None, position=None):
-        self.parent = parent
-        self.position = position
-
-        self.g = 0
-        self.f = 0
-
-    def __eq__(self, other):
-        return self.position == other.position
-
-
-class Mask:
-    def __init__(self, position, height, image):
-        self.position = position
-        self.height = height
-        self.image = image
-
-
 class TintColors:
     green = 2
     yellow = 1
@@ -200,6 +145,8 @@ class MapKeys:
     spawn_x = "spawn x"
     spawn_y = "spawn y"
     scene = "scene"
+    jump_point_search = "jump point search"
+    preload = "preload"
 
 
 class TileMap:
@@ -215,34 +162,36 @@ class TileMap:
         Camera.pos[0] = 0
         Camera.pos[1] = 0
         self.background_offset = (0, 0)
-        self.background = pygame.Surface((1, 1))
+        self.background = None
+        if MapKeys.preload in map_data:
+            assets.preload(map_data[MapKeys.preload])
         self.setup_background(map_data)
 
-        self.zoomed_bg = None
         self.interface_layer = pygame.Surface([a_settings.display_width, a_settings.display_height]).convert()
-        sheet = pygame.image.load(map_data[MapKeys.tile_sheet]).convert()
+        sheet = assets.image(map_data[MapKeys.tile_sheet])
         self.ground_tiles = dict()
         self.tile_masks = dict()
 
-        # create separate images from sprite sheet
+        # tiles and their masks are areas of two atlas surfaces rather than separate images
         sheet_rows = map_data[MapKeys.sheet_rows]
         sheet_columns = map_data[MapKeys.sheet_columns]
         tile_width = tile_extent[0] * 2
         tile_height = tile_extent[1] * 4
+        self.tile_atlas = pygame.Surface([sheet_columns * tile_width, sheet_rows * tile_height]).convert()
+        self.tile_atlas.set_colorkey(pygame.Color("black"))
+        self.tile_atlas.blit(sheet, (0, 0))
+
+        # create transparency masks from tiles
+        self.mask_atlas = self.tile_atlas.convert_alpha()
+        self.mask_atlas.fill((0, 0, 0), special_flags=pygame.BLEND_MULT)
+        self.mask_atlas.set_colorkey((0, 0, 0, 0))
+
         count = 0
         for i in range(sheet_columns):
             for j in range(sheet_rows):
-                image = pygame.Surface([tile_width, tile_height]).convert()
-                image.set_colorkey(pygame.Color("black"))
-                image.blit(sheet, (0, 0), (i * tile_width, j * tile_height, tile_width, tile_height))
-                self.ground_tiles[count] = image
-
-                # create transparency masks from tiles
-                mask_image = image.copy().convert_alpha()
-                mask_image.fill((0, 0, 0), special_flags=pygame.BLEND_MULT)
-                mask_image.set_colorkey((0, 0, 0, 0))
-                self.tile_masks[count] = mask_image
-
+                rect = (i * tile_width, j * tile_height, tile_width, tile_height)
+                self.ground_tiles[count] = self.tile_atlas.subsurface(rect)
+                self.tile_masks[count] = self.mask_atlas.subsurface(rect)
                 count += 1
 
         # read map data from file
@@ -252,19 +201,14 @@ class TileMap:
         with open(map_data[MapKeys.map_file], 'r') as map_file:
             self.tile_list = json.load(map_file)
 
-        self.unwalkable_tiles = set()
-        self.opaque_tiles = set()
-        for i in range(self.map_width):
-            for j in range(self.map_height):
-                path = map_to_path((i, j))
-                tile = self.get_tile_attributes((i, j))
-                if not tile[TileKeys.walkable]:
-                    self.unwalkable_tiles.add(tuple(path))
-                if not tile[TileKeys.line_of_sight]:
-                    self.opaque_tiles.add(tuple(path))
+        self.nav_grid = None
+        self.sight_cache = None
+        self.path_hierarchy = None
+        self.regions = None
+        self.occlusion = None
+        self.build_navigation()
 
         self.create_background()
-        self.clean_bg = self.background.copy()
 
         self.entity_list = []
 
@@ -279,30 +223,62 @@ class TileMap:
         real_offset = [0, 0]
         real_offset[0] = self.background_offset[0] * Camera.zoom + Camera.pos[0]
         real_offset[1] = self.background_offset[1] * Camera.zoom + Camera.pos[1]
-        screen.blit(self.zoomed_bg, real_offset)
+        self.background.render(screen, real_offset)
         self.draw_all_entities(screen)
 
     def draw_all_entities(self, screen):
+        # entities are kept in drawing order, their images are collected and drawn in one call
+        draws = []
         for e in self.entity_list:
             # draw the entity if it is onscreen
             render_pos = e.get_render_pos()
             if onscreen_path(render_pos):
                 # mask over the entity's image where an object is overlapping it
-                tile_pos = (round(render_pos[0]), round(render_pos[1]))
-                masks = []
-                for offset in [(0, 1), (1, 0), (1, 1), (1, -1), (-1, 1)]:
-                    new_tile = (tile_pos[0] + offset[0], tile_pos[1] + offset[1])
-                    if self.in_bounds(new_tile, False):
-                        map_tile = path_to_map(new_tile)
-                        tiles = self.get_tile_attributes(map_tile)[TileKeys.tiles]
-                        for tile in tiles:
-                            if tile[TileKeys.height] > 0:
-                                masks.append(Mask(new_tile, tile[TileKeys.height], self.tile_masks[tile[TileKeys.id]]))
-                e.render(screen, masks)
+                draws.extend(e.get_draws(self.occlusion.get((round(render_pos[0]), round(render_pos[1])))))
+        screen.blits(draws, False)
 
     def notify(self, event):
         pass
 
+    def build_navigation(self):
+        # collect tile attributes used for pathing, line of sight and occlusion from the tile list
+        self.nav_grid = navigation.NavGrid(self.map_width, self.map_height)
+        self.sight_cache = field_of_view.SightCache(self.nav_grid)
+        self.path_hierarchy = None
+        self.regions = None
+        self.occlusion = None
+        for i in range(self.map_width):
+            for j in range(self.map_height):
+                self.update_navigation((i, j))
+        self.regions = navigation.WalkableRegions(self.nav_grid)
+        # terrain masks drawn over entities are composed per tile once
+        self.occlusion = occlusion.OcclusionIndex(self)
+        # large maps answer long path searches over clusters of tiles
+        if self.map_width * self.map_height >= path_hierarchy.PathHierarchy.min_map_tiles:
+            self.path_hierarchy = path_hierarchy.PathHierarchy(self.nav_grid)
+
+    def update_navigation(self, map_coords):
+        tile = self.get_tile_attributes(map_coords)
+        tall = False
+        for layer in tile[TileKeys.tiles]:
+            if layer[TileKeys.height] > 0:
+                tall = True
+        grid = self.nav_grid
+        tile_id = grid.map_tile_id(map_coords)
+        old_flags = grid.flags[tile_id]
+        grid.set_tile(tile_id, tile[TileKeys.walkable], tile[TileKeys.line_of_sight], tall)
+        changed = grid.flags[tile_id] ^ old_flags
+        if changed & NavFlags.transparent:
+            # drop cached sight lines that could pass through this tile
+            self.sight_cache.invalidate(grid.tile_coords(tile_id))
+        if changed & NavFlags.walkable:
+            if self.regions is not None:
+                self.regions.update(tile_id)
+            if self.path_hierarchy is not None:
+                self.path_hierarchy.invalidate(grid.tile_coords(tile_id))
+        if self.occlusion is not None:
+            self.occlusion.invalidate(grid.tile_coords(tile_id))
+
     def add_entities(self, filename):
         with open(filename) as f:
             entity_data = json.load(f)
@@ -320,8 +296,8 @@ class TileMap:
         Camera.pos[0] = map_data[MapKeys.camera_x]
         Camera.pos[1] = map_data[MapKeys.camera_y]
         self.background_offset = (-self.border_width * tile_extent[0] * 2, -self.border_height * tile_extent[1])
-        self.background = pygame.Surface([(self.map_width + self.border_width * 2 + 1) * tile_extent[0] * 2,
-                                          (self.map_height + self.border_height * 2 + 1) * tile_extent[1]]).convert()
+        self.background = ChunkedBackground((self.map_width + self.border_width * 2 + 1) * tile_extent[0] * 2,
+                                            (self.map_height + self.border_height * 2 + 1) * tile_extent[1])
 
     def default_background(self, dimensions=None):
         # create a background from a raw map file without using any scene data
@@ -341,8 +317,8 @@ class TileMap:
         Camera.pos[0] = 0
         Camera.pos[1] = 0
         self.background_offset = (-self.border_width * tile_extent[0] * 2, -self.border_height * tile_extent[1])
-        self.background = pygame.Surface([(self.map_width + self.border_width * 2 + 1) * tile_extent[0] * 2,
-                                          (self.map_height + self.border_height * 2 + 1) * tile_extent[1]]).convert()
+        self.background = ChunkedBackground((self.map_width + self.border_width * 2 + 1) * tile_extent[0] * 2,
+                                            (self.map_height + self.border_height * 2 + 1) * tile_extent[1])
 
     def create_background(self):
         # create a grayed out border image
@@ -365,22 +341,11 @@ class TileMap:
         self.zoom_background()
 
     def zoom_background(self):
-        self.zoomed_bg = pygame.transform.scale(
-            self.background,
-            (round(self.background.get_width() * Camera.zoom), round(self.background.get_height() * Camera.zoom))
-        )
-        self.zoomed_bg.convert()
-        self.clean_bg = self.zoomed_bg.copy()
+        # chunks are scaled when they are next drawn
+        self.background.set_zoom(Camera.zoom)
 
     def zoom_image(self, image):
-        if Camera.zoom != 1:
-            zoomed = pygame.transform.scale(
-                image,
-                (round(image.get_width() * Camera.zoom), round(image.get_height() * Camera.zoom))
-            )
-            zoomed.convert()
-            return zoomed
-        return image
+        return sprite_cache.scaled(image, Camera.zoom)
 
     def get_tile_path(self, coords):
         map_coords = path_to_map(coords)
@@ -395,6 +360,8 @@ class TileMap:
     def set_tile_attributes(self, tile_pos, tile_data):
         hashed = tile_pos[0] * 1000 + tile_pos[1]
         self.tile_list[str(hashed)] = tile_data
+        if 0 <= tile_pos[0] < self.map_width and 0 <= tile_pos[1] < self.map_height:
+            self.update_navigation(tile_pos)
 
     def move_camera_to_path(self, tile):
         destination = path_to_world((tile[0] - 3, tile[1] + 1))
@@ -420,6 +387,7 @@ class TileMap:
         min_speed = 3
 
         screen = pygame.display.get_surface()
+        compositor.redraw_all()
         while [difference[0] > 0, difference[1] > 0] == direction:
             pygame.time.wait(wait_ms)
             for event in pygame.event.get():
@@ -470,17 +438,12 @@ class TileMap:
 
     def in_bounds(self, coords, walkable_only, need_los=False):
         # valid if: x >= y, x + y > 0, x + y < map_height, x - y < map_width * 2
-        if coords[0] < abs(coords[1]) or coords[0] + coords[1] >= self.map_height \
-                or coords[0] - coords[1] >= self.map_width * 2:
-            return False
-        if walkable_only or need_los:
-            valid = True
-            if walkable_only:
-                valid = not (coords[0], coords[1]) in self.unwalkable_tiles
-            if valid and need_los:
-                valid = not (coords[0], coords[1]) in self.opaque_tiles
-            return valid
-        return True
+        mask = NavFlags.in_bounds
+        if walkable_only:
+            mask |= NavFlags.walkable
+        if need_los:
+            mask |= NavFlags.transparent
+        return self.nav_grid.has_flags(coords, mask)
 
     def z_order_sort_entities(self):
         self.entity_list.sort()
@@ -496,8 +459,26 @@ class TileMap:
 
 class CombatMap(TileMap):
     mouse_coords = None
+    # random picks made for an enemy before it spawns on an unreachable or taken tile anyway
+    spawn_attempts = 20
+    # images and sounds every battle uses, loaded before the map's own
+    manifest = [
+        {"image": "images/selection_square.png", "colorkey": "black"},
+        {"image": "images/path_arrow.png", "colorkey": "black"},
+        {"image": "images/path_arrow_horizontal.png", "colorkey": "black"},
+        {"image": "images/path_arrow_vertical.png", "colorkey": "black"},
+        {"image": "images/tintable_square.png", "alpha": True},
+        {"image": "images/entity/default/default.png", "colorkey": "black"},
+        {"image": "images/icons/skill_icon.png"},
+        {"sound": "game_sounds/defaultSound.wav"}
+    ]
+    # number of path searches remembered between board changes
+    path_cache_size = 256
+    # number of skill areas remembered between tile changes
+    area_cache_size = 512
 
     def __init__(self, filename):
+        assets.preload(CombatMap.manifest)
         super().__init__(filename)
         f = open(filename)
         map_data = json.load(f)
@@ -508,17 +489,20 @@ class CombatMap(TileMap):
         self.skill_display_update = False
 
         # initialize other images
-        self.selection_square = pygame.image.load("images/selection_square.png").convert()
-        self.selection_square.set_colorkey(pygame.Color("black"))
-        self.path_arrow = pygame.image.load("images/path_arrow.png").convert()
-        self.path_arrow.set_colorkey(pygame.Color("black"))
-        self.path_arrow_horizontal = pygame.image.load("images/path_arrow_horizontal.png").convert()
-        self.path_arrow_horizontal.set_colorkey(pygame.Color("black"))
-        self.path_arrow_vertical = pygame.image.load("images/path_arrow_vertical.png").convert()
-        self.path_arrow_vertical.set_colorkey(pygame.Color("black"))
+        self.selection_square = assets.image("images/selection_square.png", colorkey="black")
+        self.path_arrow = assets.image("images/path_arrow.png", colorkey="black")
+        self.path_arrow_horizontal = assets.image("images/path_arrow_horizontal.png", colorkey="black")
+        self.path_arrow_vertical = assets.image("images/path_arrow_vertical.png", colorkey="black")
+        # arrow for each direction of a path step, built for path_arrows_zoom
+        self.path_arrows = {}
+        self.path_arrows_zoom = None
+        # arrows and screen positions along the displayed path, kept until the path or camera changes
+        self.path_draws = []
+        self.path_draws_path = []
+        self.path_draws_camera = None
 
         # create tile tint images
-        self.white_tile_tint = pygame.image.load("images/tintable_square.png").convert_alpha()
+        self.white_tile_tint = assets.image("images/tintable_square.png", alpha=True)
         red_tile_tint = self.white_tile_tint.copy()
         green_tile_tint = self.white_tile_tint.copy()
         yellow_tile_tint = self.white_tile_tint.copy()
@@ -531,21 +515,32 @@ class CombatMap(TileMap):
             TintColors.green: green_tile_tint
         }
         self.tinted_tiles = {
-            TintColors.red: set(),
-            TintColors.yellow: set(),
-            TintColors.green: set()
-        }
-        self.old_tinted_tiles = {
-            TintColors.red: set(),
-            TintColors.yellow: set(),
-            TintColors.green: set()
+            TintColors.red: TileSet(self.nav_grid),
+            TintColors.yellow: TileSet(self.nav_grid),
+            TintColors.green: TileSet(self.nav_grid)
         }
+        # tinted tiles as they are drawn over the background
+        self.tint_draws = []
+        self.tint_draws_camera = None
         self.cached_skill = None
 
         # objects to display
         self.path = []
-        self.possible_paths = set()
-        self.last_path_test = (-99, -199)
+        self.movement_field = None
+        self.flow_field = None
+        # bumped whenever characters move, appear or disappear, so cached answers about the board are never stale
+        self.board_version = 0
+        self.path_cache = OrderedDict()
+        self.area_cache = {}
+        # characters standing on each tile, and the tile each character was last indexed on
+        self.occupants = {}
+        self.occupant_tiles = {}
+        # position of each indexed character in character_list, so lookups by tile can answer in roster order
+        self.roster_index = {}
+        self.roster_count = 0
+        self.jump_point_search = a_settings.jump_point_search
+        if MapKeys.jump_point_search in map_data.keys():
+            self.jump_point_search = map_data[MapKeys.jump_point_search]
         self.selected_character = None
         self.character_list = []
         self.interface = user_interface.UserInterface()
@@ -615,94 +610,52 @@ class CombatMap(TileMap):
             self.skill_display_update = True
 
     def render(self, screen):
-        # create offset used by tint_layer
-        real_offset = [0, 0]
-        real_offset[0] = self.background_offset[0] * Camera.zoom
-        real_offset[1] = self.background_offset[1] * Camera.zoom
-
-        self.apply_tint_layer_to_bg(real_offset)
-
-        # draw background first
-        bg_offset = [0, 0]
-        bg_offset[0] = real_offset[0] + Camera.pos[0]
-        bg_offset[1] = real_offset[1] + Camera.pos[1]
-        screen.blit(self.zoomed_bg, bg_offset)
-
-        self.draw_movement_path(screen)
-
-        if self.selected_character is not None:
-            self.display_skill_info(self.selected_character.get_selected_skill())
-        self.skill_display_update = False
-        self.draw_all_entities(screen)
-        self.scene.render(screen)
-
-        for e in self.entity_list:
-            if self.mouse_coords == e.position:
-                e.on_highlight()
-
-        # draw character UI elements
-        for c in self.character_list:
-            c.second_render(screen)
+        # draw background first, tints are drawn over it so the background itself is never changed
+        with profiler.scope("background"):
+            bg_offset = [0, 0]
+            bg_offset[0] = self.background_offset[0] * Camera.zoom + Camera.pos[0]
+            bg_offset[1] = self.background_offset[1] * Camera.zoom + Camera.pos[1]
+            self.background.render(screen, bg_offset)
+        with profiler.scope("tint"):
+            screen.blits(self.get_tint_draws(), False)
+
+        with profiler.scope("path"):
+            self.draw_movement_path(screen)
+
+        # skill previews change the tints shown next frame
+        with profiler.scope("tint"):
+            if self.selected_character is not None:
+                self.display_skill_info(self.selected_character.get_selected_skill())
+            self.skill_display_update = False
+        with profiler.scope("entities"):
+            self.draw_all_entities(screen)
+            self.scene.render(screen)
+
+            for e in self.entity_list:
+                if self.mouse_coords == e.position:
+                    e.on_highlight()
+
+        with profiler.scope("ui"):
+            # draw character UI elements
+            for c in self.character_list:
+                c.second_render(screen)
 
-        # draw map UI and scene UI last
-        self.interface.render(screen)
-        self.scene.second_render(screen)
+            # draw map UI and scene UI last
+            self.interface.render(screen)
+            self.scene.second_render(screen)
 
-    def apply_tint_layer_to_bg(self, real_offset):
-        if self.tint_layer_update:
+    def get_tint_draws(self):
+        # tint images and screen positions for every tinted tile, rebuilt when the tints or camera change
+        camera = (Camera.zoom, Camera.pos[0], Camera.pos[1])
+        if self.tint_layer_update or camera != self.tint_draws_camera:
             self.tint_layer_update = False
-
-            # get a list of all tiles that don't need an update
-            tiles_to_cache = set()
-            for color in self.tinted_tiles.keys():
-                tiles_to_cache = tiles_to_cache.union(self.tinted_tiles[color] & self.old_tinted_tiles[color])
-
-            # update tiles that have any differences between old and new sets
-            for color in self.tinted_tiles.keys():
-                for tile in self.old_tinted_tiles[color] ^ self.tinted_tiles[color]:
-                    tiles_to_cache.discard(tile)
-
-            # create a surface to transfer from clean bg, then mask it in shape of the tile
-            zoom_mask = self.zoom_image(self.white_tile_tint)
-            clean_surface = pygame.Surface(
-                (tile_extent[0] * 2 * Camera.zoom,
-                 tile_extent[1] * 2 * Camera.zoom)
-            ).convert()
-            clean_surface.fill((0, 0, 0, 0))
-            clean_surface.set_colorkey((0, 0, 0, 0))
-
-            tiles_to_clean = set()
-            for tile_set in self.old_tinted_tiles.values():
-                tiles_to_clean = tiles_to_clean.union(tile_set)
-
-            # remove tint from bg using original copy
-            for tile in tiles_to_clean:
-                if tile not in tiles_to_cache:
-                    tile_pos = path_to_world(tile)
-                    tile_offset = ((tile_pos[0] - self.background_offset[0]) * Camera.zoom,
-                                   (tile_pos[1] - self.background_offset[1]) * Camera.zoom)
-                    clean_surface.blit(zoom_mask, (0, 0))
-                    clean_surface.blit(
-                        self.clean_bg,
-                        (0, 0),
-                        (tile_offset[0], tile_offset[1],
-                         tile_extent[0] * 2 * Camera.zoom, tile_extent[1] * 2 * Camera.zoom),
-                        special_flags=pygame.BLEND_MULT
-                    )
-                    self.zoomed_bg.blit(clean_surface, tile_offset)
-
-            for tile_set in self.old_tinted_tiles.values():
-                tile_set.clear()
-
-            # after clearing old tiles, tint the bg tiles the proper color
+            self.tint_draws = []
             for color in self.tinted_tiles.keys():
                 zoom_tint = self.zoom_image(self.tint_images[color])
                 for tile in self.tinted_tiles[color]:
-                    if tile not in tiles_to_cache:
-                        tint_pos = path_to_world(tile)
-                        tint_pos[0] = tint_pos[0] * Camera.zoom - real_offset[0]
-                        tint_pos[1] = tint_pos[1] * Camera.zoom - real_offset[1]
-                        self.zoomed_bg.blit(zoom_tint, tint_pos)
+                    self.tint_draws.append((zoom_tint, path_to_screen(tile)))
+            self.tint_draws_camera = camera
+        return self.tint_draws
 
     def draw_movement_path(self, screen):
         zoom_selection = self.zoom_image(self.selection_square)
@@ -722,51 +675,54 @@ class CombatMap(TileMap):
 
                 # draw arrows along path in direction of path
                 if len(self.path) > 1:
-                    last_loc = self.path[0]
-                    offset = -tile_extent[1] * Camera.zoom
-                    diagonal_arrow = self.zoom_image(self.path_arrow)
-                    horizontal_arrow = self.zoom_image(self.path_arrow_horizontal)
-                    vertical_arrow = self.zoom_image(self.path_arrow_vertical)
-                    for loc in self.path[1:]:
-                        arrow = None
-                        if last_loc[0] > loc[0]:
-                            if last_loc[1] > loc[1]:
-                                # up arrow
-                                arrow = pygame.transform.flip(vertical_arrow, False, True)
-                            elif last_loc[1] < loc[1]:
-                                # left arrow
-                                arrow = pygame.transform.flip(horizontal_arrow, True, False)
-                            else:
-                                # up-left arrow
-                                arrow = pygame.transform.flip(diagonal_arrow, True, True)
-                        elif last_loc[0] < loc[0]:
-                            if last_loc[1] > loc[1]:
-                                # right arrow
-                                arrow = horizontal_arrow
-                            elif last_loc[1] < loc[1]:
-                                # down arrow
-                                arrow = vertical_arrow
-                            else:
-                                # down-right arrow
-                                arrow = diagonal_arrow
-                        else:
-                            if last_loc[1] > loc[1]:
-                                # up-right arrow
-                                arrow = pygame.transform.flip(diagonal_arrow, False, True)
-                            elif last_loc[1] < loc[1]:
-                                # down-left arrow
-                                arrow = pygame.transform.flip(diagonal_arrow, True, False)
-                            else:
-                                print("ERROR: supplied path contains duplicate points")
-
-                        render_loc = path_to_screen(loc)
-                        screen.blit(arrow, (render_loc[0], render_loc[1] + offset))
-                        last_loc = loc
+                    screen.blits(self.get_path_draws(), False)
 
         # draw highlighted square around mouse position
         if self.scene.get_allow_input():
             screen.blit(zoom_selection, path_to_screen(self.mouse_coords))
 
+    def get_path_arrows(self):
+        # the arrow for each step direction, flipped from the three arrow images once per zoom level
+        if self.path_arrows_zoom != Camera.zoom:
+            diagonal_arrow = self.zoom_image(self.path_arrow)
+            horizontal_arrow = self.zoom_image(self.path_arrow_horizontal)
+            vertical_arrow = self.zoom_image(self.path_arrow_vertical)
+            self.path_arrows = {
+                # up, left and up-left
+                (-1, -1): pygame.transform.flip(vertical_arrow, False, True),
+                (-1, 1): pygame.transform.flip(horizontal_arrow, True, False),
+                (-1, 0): pygame.transform.flip(diagonal_arrow, True, True),
+                # right, down and down-right
+                (1, -1): horizontal_arrow,
+                (1, 1): vertical_arrow,
+                (1, 0): diagonal_arrow,
+                # up-right and down-left
+                (0, -1): pygame.transform.flip(diagonal_arrow, False, True),
+                (0, 1): pygame.transform.flip(diagonal_arrow, True, False)
+            }
+            self.path_arrows_zoom = Camera.zoom
+        return self.path_arrows
+
+    def get_path_draws(self):
+        camera = (Camera.zoom, Camera.pos[0], Camera.pos[1])
+        if camera != self.path_draws_camera or self.path != self.path_draws_path:
+            arrows = self.get_path_arrows()
+            offset = -tile_extent[1] * Camera.zoom
+            self.path_draws = []
+            last_loc = self.path[0]
+            for loc in self.path[1:]:
+                step = ((loc[0] > last_loc[0]) - (loc[0] < last_loc[0]),
+                        (loc[1] > last_loc[1]) - (loc[1] < last_loc[1]))
+                if step in arrows:
+                    render_loc = path_to_screen(loc)
+                    self.path_draws.append((arrows[step], (render_loc[0], render_loc[1] + offset)))
+                else:
+                    print("ERROR: supplied path contains duplicate points")
+                last_loc = loc
+            self.path_draws_path = self.path.copy()
+            self.path_draws_camera = camera
+        return self.path_draws
+
     def display_skill_info(self, skill, force_update=False):
         # render the area that will be hit by a skill
         if skill is not None:
@@ -815,22 +771,20 @@ class CombatMap(TileMap):
 
                 if not aimed:
                     # find if tile is occupied by a character
-                    for c in self.character_list:
-                        if mouse_coords == c.position:
-
-                            # when a valid target is clicked on while a skill is selected, try to use the skill
-                            if skill is not None and (
-                                    c.ally == skill.has_tag("buff") or skill.has_tag("friendly fire")) and \
-                                    self.selected_character.use_skill(mouse_coords):
-                                return
+                    for c in self.characters_at(mouse_coords):
+                        # when a valid target is clicked on while a skill is selected, try to use the skill
+                        if skill is not None and (
+                                c.ally == skill.has_tag("buff") or skill.has_tag("friendly fire")) and \
+                                self.selected_character.use_skill(mouse_coords):
+                            return
 
-                            # deselect previous character and select the new one
-                            if selected is not None:
-                                self.selected_character.set_selected(False)
+                        # deselect previous character and select the new one
+                        if selected is not None:
+                            self.selected_character.set_selected(False)
 
-                            self.clear_tinted_tiles()
-                            self.selected_character = c.set_selected(True)
-                            return
+                        self.clear_tinted_tiles()
+                        self.selected_character = c.set_selected(True)
+                        return
 
                     # move selected character to unoccupied position if able
                     if selected is not None and selected.move_order(self.path):
@@ -897,6 +851,7 @@ class CombatMap(TileMap):
             self.controlled_characters.append(new_character)
             self.character_list.append(new_character)
             self.entity_list.append(new_character)
+            self.update_occupancy(new_character)
 
     def add_entities(self, entity_data):
         for c in entity_data:
@@ -907,10 +862,22 @@ class CombatMap(TileMap):
             new_character = character.AICharacter(spawn, self, self.ai_manager, c)
             self.character_list.append(new_character)
             self.entity_list.append(new_character)
+            self.update_occupancy(new_character)
 
         self.z_order_sort_entities()
 
     def get_enemy_spawn_location(self):
+        # try for a free tile that can walk to where the party spawns, otherwise settle for the last pick
+        spawn = self.random_spawn_location()
+        if not hasattr(self, "spawn_points") or len(self.spawn_points) == 0:
+            return spawn
+        for attempt in range(CombatMap.spawn_attempts):
+            if self.regions.connected(spawn, self.spawn_points[0]) and not self.is_occupied(spawn):
+                break
+            spawn = self.random_spawn_location()
+        return spawn
+
+    def random_spawn_location(self):
         min_x = self.enemy_spawn_area[0][0]
         max_x = self.enemy_spawn_area[1][0]
         x = random.randint(min_x, max_x)
@@ -929,6 +896,7 @@ class CombatMap(TileMap):
             for i, o in enumerate(self.character_list):
                 if o.delete:
                     del self.character_list[i]
+                    self.update_occupancy(o)
                     found = True
                     break
 
@@ -944,20 +912,58 @@ class CombatMap(TileMap):
                     found = True
                     break
 
+    def board_changed(self):
+        self.board_version += 1
+
+    def update_occupancy(self, moved):
+        # keep the tile index in step with a character that moved, was added or was removed
+        old_tile = self.occupant_tiles.pop(moved, None)
+        if old_tile is not None:
+            occupants = self.occupants[old_tile]
+            occupants.remove(moved)
+            if len(occupants) == 0:
+                del self.occupants[old_tile]
+                self.set_occupied_flag(old_tile, False)
+        if moved.delete:
+            self.roster_index.pop(moved, None)
+        else:
+            # characters are indexed right after joining character_list, so the first time seen is their roster place
+            if moved not in self.roster_index:
+                self.roster_index[moved] = self.roster_count
+                self.roster_count += 1
+            tile = (moved.position[0], moved.position[1])
+            self.occupant_tiles[moved] = tile
+            self.occupants.setdefault(tile, []).append(moved)
+            self.set_occupied_flag(tile, True)
+        self.board_changed()
+
+    def set_occupied_flag(self, tile, occupied):
+        tile_id = self.nav_grid.tile_id(tile)
+        if tile_id >= 0:
+            self.nav_grid.set_flag(tile_id, NavFlags.occupied, occupied)
+
+    def tile_set(self, tiles=()):
+        return TileSet(self.nav_grid, tiles)
+
+    def occupied_tiles(self):
+        return TileSet(self.nav_grid, self.occupants)
+
+    def characters_at(self, tile):
+        # the returned list belongs to the index and must not be changed
+        return self.occupants.get((tile[0], tile[1]), [])
+
+    def is_occupied(self, tile, ignore=None):
+        for c in self.characters_at(tile):
+            if c is not ignore:
+                return True
+        return False
+
     def get_spawn(self):
         spawn_pos = self.spawn_points[self.spawns_used]
         self.spawns_used += 1
         return spawn_pos
 
     def clear_tinted_tiles(self):
-        has_tint = False
-        for tile_set in self.tinted_tiles.values():
-            if len(tile_set) > 0:
-                has_tint = True
-                break
-        if has_tint:
-            for color in self.tinted_tiles.keys():
-                self.old_tinted_tiles[color] = self.tinted_tiles[color].copy()
         for tiles in self.tinted_tiles.values():
             tiles.clear()
         self.tint_layer_update = True
@@ -966,201 +972,219 @@ class CombatMap(TileMap):
             c.reset_display()
 
     def display_movement(self, position, movement, total_move=None):
-        self.possible_paths = self.find_all_paths(position, total_move)
+        # one search covers both ranges, the field is kept around so find_path can read hovered paths from it
+        max_move = movement
+        if total_move is not None and total_move > movement:
+            max_move = total_move
+        self.movement_field = pathfinding.distance_field(self.nav_grid, [position], max_move)
+
         # show possible movement tiles for selected character
         self.clear_tinted_tiles()
-        self.tinted_tiles[TintColors.green] = self.find_all_paths(position, movement)
+        self.tinted_tiles[TintColors.green] = self.movement_field.tiles_within(movement)
         if total_move is not None and total_move != movement:
-            self.tinted_tiles[TintColors.yellow] = self.find_all_paths(position, total_move)
-            for tile in self.tinted_tiles[TintColors.green]:
-                self.tinted_tiles[TintColors.yellow].discard(tile)
+            self.tinted_tiles[TintColors.yellow] = \
+                self.movement_field.tiles_within(total_move) - self.tinted_tiles[TintColors.green]
         # dirty the mouse coordinates so there will be an immediate path update
         self.mouse_coords = (-1, -1)
 
+    def update_flow_field(self):
+        # distance from every tile to the closest standing ally, built once per AI turn and shared by all AI characters
+        allies = [c.position for c in self.character_list if c.ally and not c.knocked_out]
+        self.flow_field = pathfinding.distance_field(self.nav_grid, allies, 99)
+
     def get_characters_in_set(self, tile_set):
+        # in character_list order, callers such as AI targeting take the first one
         inside = []
-        for c in self.character_list:
-            if (c.position[0], c.position[1]) in tile_set:
-                inside.append(c)
+        for tile in tile_set:
+            inside += self.characters_at(tile)
+        inside.sort(key=self.roster_index.__getitem__)
         return inside
 
     def make_radius(self, center, radius, walkable_only):
-        open_list = set()
-        closed_list = set()
-        open_list.add((center[0], center[1]))
-        steps = -1
+        grid = self.nav_grid
+        flags = grid.flags
+        mask = NavFlags.in_bounds
+        if walkable_only:
+            mask |= NavFlags.walkable
+        center_id = grid.tile_id(center)
+        if center_id < 0:
+            return TileSet(grid)
+        if not flags[center_id] & NavFlags.in_bounds:
+            # floods only stay inside the padding around in bounds tiles, so a center outside the map is left alone
+            return TileSet.from_ids(grid, [center_id])
+        radius_tiles = stencils.stamp(grid, center, stencils.get_radius_stencil(radius), mask)
+        if radius_tiles is not None:
+            return radius_tiles
+
+        open_list = [center_id]
+        closed_list = bytearray(grid.size)
+        closed_list[center_id] = 1
+        radius_ids = [center_id]
+        steps = 0
         while steps < radius:
             steps += 1
-            working_list = open_list.copy()
-            open_list.clear()
+            working_list = open_list
+            open_list = []
             for current_center in working_list:
-                closed_list.add(current_center)
-                for new_position in [(0, -1), (0, 1), (-1, 0), (1, 0)]:  # Adjacent squares
-                    neighbor = (current_center[0] + new_position[0], current_center[1] + new_position[1])
-                    if neighbor not in closed_list and self.in_bounds(neighbor, walkable_only):
-                        open_list.add(neighbor)
-        return closed_list
+                for delta in grid.orthogonal:  # Adjacent squares
+                    neighbor = current_center + delta
+                    if not closed_list[neighbor] and flags[neighbor] & mask == mask:
+                        closed_list[neighbor] = 1
+                        open_list.append(neighbor)
+                        radius_ids.append(neighbor)
+        return TileSet.from_ids(grid, radius_ids)
 
     def line_of_sight(self, p0, p1, length=None):
         if length is not None and distance_between(p0, p1) > length:
             return False
-        line = supercover_line(p0, p1)
-        for tile in line:
-            if not self.in_bounds(tile, False, True):
-                return False
-        return True
+        return self.sight_cache.line_of_sight(p0, p1)
 
     def find_all_paths(self, start, max_length, projectile=False, edges_only=False, indirect=False):
+        grid = self.nav_grid
+        start_id = grid.tile_id(start)
+        if start_id < 0:
+            # nothing around a point that far outside the map can be in bounds
+            return TileSet(grid)
+        if not grid.flags[start_id] & NavFlags.in_bounds:
+            # searches only stay inside the padding around in bounds tiles, so a start outside the map is left alone
+            return TileSet.from_ids(grid, [start_id])
+        if not projectile and not edges_only and not indirect:
+            # plain movement ranges come from a Dijkstra search so every tile is settled at its lowest cost
+            return pathfinding.distance_field(grid, [start], max_length).tiles_within(max_length)
+
+        # choose which flags a tile needs to be part of the area
+        if indirect:
+            mask = NavFlags.in_bounds
+        elif projectile:
+            mask = NavFlags.transparent
+        else:
+            mask = NavFlags.walkable
+
+        if edges_only:
+            return self.flood_tiles(start_id, max_length, mask, projectile, True, indirect)
+
+        # areas are remembered per center until tiles change, callers get copies since tint sets are cleared in place
+        key = (start_id, max_length, projectile, indirect)
+        cached = self.area_cache.get(key)
+        if cached is not None and cached[0] == grid.version:
+            return cached[1].copy()
+        # when nothing inside the area is blocked it is the precomputed stencil, otherwise it has to be flooded
+        stencil = stencils.get_area_stencil(max_length, projectile and not indirect)
+        area = stencils.stamp(grid, start, stencil, mask)
+        if area is None:
+            area = self.flood_tiles(start_id, max_length, mask, projectile, False, indirect)
+        if len(self.area_cache) >= CombatMap.area_cache_size:
+            self.area_cache.clear()
+        self.area_cache[key] = (grid.version, area)
+        return area.copy()
+
+    def flood_tiles(self, start_id, max_length, mask, projectile, edges_only, indirect):
+        grid = self.nav_grid
+        start = grid.tile_coords(start_id)
+        flags = grid.flags
+        # projectiles can only reach tiles the start has line of sight to, found in one sweep up front
+        visible = None
+        if projectile and not indirect:
+            visible = self.sight_cache.visible_tiles(start, max_length)
+        # orthogonal steps have no tiles that can block them
+        steps = tuple((delta, 0, 0) for delta in grid.orthogonal) + grid.diagonal
         # Initialize both open and closed list
-        open_list = [(start[0], start[1], 0)]
-        open_list_pos = {start[0], start[1]}
+        open_list = [(start_id, 0)]
+        seen = bytearray(grid.size)
+        seen[start_id] = 1
         closed_index = 0
-        closed_list = set()
-        edge_list = set()
+        edge_list = []
 
         # Loop until you find the end
         while closed_index < len(open_list):
 
             # Pop current off open list, add to closed list
-            current_node = open_list[closed_index]
+            current_id, current_g = open_list[closed_index]
             closed_index += 1
-            current_position = (current_node[0], current_node[1])
-            open_list_pos.discard(current_position)
-            closed_list.add(current_position)
 
-            if current_node[2] + 1 > max_length:
+            if current_g + 1 > max_length:
                 if edges_only:
-                    edge_list.add(current_position)
+                    edge_list.append(current_id)
                 continue
 
             valid_adjacent = 0
-            for new_position in [(0, -1), (0, 1), (-1, 0), (1, 0),
-                                 (-1, -1), (-1, 1), (1, -1), (1, 1)]:  # Adjacent squares
+            for delta, side_a, side_b in steps:  # Adjacent squares
 
-                g = current_node[2] + 1
-                node_position = (current_node[0] + new_position[0], current_node[1] + new_position[1])
+                g = current_g + 1
+                node_id = current_id + delta
 
-                if node_position in open_list_pos or node_position in closed_list:
+                if seen[node_id]:
                     valid_adjacent += 1
                     continue
 
                 # Make sure tile is not blocked
-                if indirect:
-                    if not self.in_bounds(node_position, False, False):
+                if not flags[node_id] & mask:
+                    if indirect:
                         valid_adjacent += 1
-                        continue
-                elif projectile:
-                    if not self.in_bounds(node_position, False, True) or not self.line_of_sight(start, node_position):
-                        continue
-                else:
-                    if not self.in_bounds(node_position, True):
-                        continue
+                    continue
+                if visible is not None and node_id not in visible:
+                    continue
 
                 # handle diagonal movement
-                if new_position[0] != 0 and new_position[1] != 0:
+                if side_a:
                     g += 0.414
                     if g > max_length:
                         continue
                     # check if a tile is blocking diagonal movement
-                    if not indirect and (
-                            not self.in_bounds([node_position[0], current_node[1]], not projectile, projectile) or
-                            not self.in_bounds([current_node[0], node_position[1]], not projectile, projectile)):
+                    if not indirect and (not flags[current_id + side_a] & mask or
+                                         not flags[current_id + side_b] & mask):
                         continue
 
                 # Create new node
-                new_node = (node_position[0], node_position[1], g)
-                open_list.append(new_node)
-                open_list_pos.add(node_position)
+                open_list.append((node_id, g))
+                seen[node_id] = 1
                 valid_adjacent += 1
             if edges_only and valid_adjacent < 8:
-                edge_list.add(current_position)
+                edge_list.append(current_id)
         if edges_only:
-            return edge_list
-        return closed_list
+            return TileSet.from_ids(grid, edge_list)
+        return TileSet.from_ids(grid, [tile_id for tile_id, g in open_list])
 
     def find_path(self, start, end, max_length):
-        end = tuple(end)
-        if not self.in_bounds(end, True):
-            return []
-
-        if start != self.last_path_test:
-            self.possible_paths = self.find_all_paths(start, max_length)
-            self.last_path_test = start
-
-        if end not in self.possible_paths:
+        # no search can reach a tile in another walkable region
+        start_region = self.regions.region(start)
+        end_region = self.regions.region(end)
+        if end_region == 0 or (start_region != 0 and start_region != end_region):
             return []
 
-        start_node = Node(None, tuple(start))
-        open_list = {tuple(start): start_node}
-        closed_list = set()
-
-        # Loop until finding the end
-        loops = 0
-        while len(open_list) > 0 and loops < 1000:
-            loops += 1
-
-            # Get node closest to destination
-            current_node = next(iter(open_list.values()))
-            current_position = current_node.position
-            for key in open_list.keys():
-                if open_list[key].f < current_node.f:
-                    current_node = open_list[key]
-                    current_position = key
-
-            # Found the goal
-            if current_position == end:
-                path = []
-                current = current_node
-                while current is not None:
-                    path.append(current.position)
-                    current = current.parent
-                return path[::-1]  # Return reversed path
-
-            open_list.pop(current_position)
-            closed_list.add(current_position)
-
-            if current_node.g + 1 > max_length:
-                continue
-
-            for new_position in [(0, -1), (0, 1), (-1, 0), (1, 0),
-                                 (-1, -1), (-1, 1), (1, -1), (1, 1)]:  # Adjacent squares
-
-                g = current_node.g + 1
-                node_position = (current_position[0] + new_position[0], current_position[1] + new_position[1])
-
-                if node_position in closed_list:
-                    continue
-
-                # Make sure tile is valid
-                if not self.in_bounds(node_position, True):
-                    # add non-walkable tiles to closed list to improve performance
-                    closed_list.add(node_position)
-                    continue
-
-                # handle diagonal movement
-                if new_position[0] != 0 and new_position[1] != 0:
-                    g += 0.414
-                    if g > max_length:
-                        continue
-                    # check if a tile is blocking diagonal movement
-                    if not self.in_bounds([node_position[0], current_position[1]], True) \
-                            or not self.in_bounds([current_position[0], node_position[1]], True):
-                        continue
-
-                # deterministically alter predicted distance to break ties and improve performance
-                hashed = 1000 * node_position[0] + node_position[1]
-                h = distance_between(node_position, end) * (1 + hashed / 100000)
-                f = g + h
-
-                # make sure a better path does not exist
-                if node_position in open_list.keys() and g >= open_list[node_position].g:
-                    continue
+        # paths from the selected character are rebuilt from its movement field without a new search
+        field = self.movement_field
+        if field is not None and field.grid is self.nav_grid and field.origins == ((start[0], start[1]),) \
+                and max_length <= field.max_length:
+            cost = field.cost(end)
+            if cost is None or cost > max_length:
+                return []
+            return field.path_to(end)
+
+        # answers are kept until the board or the tiles change, characters walk their paths so they get copies
+        key = (start[0], start[1], end[0], end[1], max_length)
+        version = (self.board_version, self.nav_grid.version)
+        cached = self.path_cache.get(key)
+        if cached is not None and cached[0] == version:
+            self.path_cache.move_to_end(key)
+            return list(cached[1])
+
+        path = []
+        hierarchy = self.path_hierarchy
+        if hierarchy is not None and distance_between(start, end) > hierarchy.cluster_size * 2:
+            path = hierarchy.find_path(start, end, max_length)
+        # the hierarchy's route can run longer than the shortest path, so past max_length the exact search decides
+        if len(path) == 0:
+            if self.jump_point_search:
+                path = pathfinding.jump_point_search(self.nav_grid, start, end, max_length)
+            else:
+                path = pathfinding.find_path(self.nav_grid, start, end, max_length)
 
-                new_node = Node(current_node, node_position)
-                new_node.g = g
-                new_node.f = f
-                open_list[node_position] = new_node
-        return []
+        self.path_cache[key] = (version, path)
+        self.path_cache.move_to_end(key)
+        if len(self.path_cache) > CombatMap.path_cache_size:
+            self.path_cache.popitem(last=False)
+        return list(path)
 
     def start_turn(self):
         for c in self.entity_list:
@@ -4,6 +4,9 @@ from dialogue import draw_shadowed_text
 import json
 import game_modes
 from game_state import start_expedition
+import compositor
+import fonts
+import assets
 
 
 def get_text_input(screen, text=None):
@@ -12,7 +15,9 @@ def get_text_input(screen, text=None):
                   a_settings.display_width / 3, a_settings.display_height / 3)
     input_border = (a_settings.display_width / 4, a_settings.display_height / 4,
                     a_settings.display_width / 2, a_settings.display_height / 2)
-    font = pygame.font.SysFont(None, 48)
+    font = fonts.get_font(None, 48)
+    # the prompt draws straight to the display, so the frame after it is redrawn in full
+    compositor.redraw_all()
     while True:
         for event in pygame.event.get():
             if event.type == pygame.KEYDOWN:
@@ -52,7 +57,7 @@ def get_text_input(screen, text=None):
 class ImageButton:
     def __init__(self, rect, text, button_id, hover_text=None, image_file=None, is_button=True):
         if image_file is not None:
-            self.image = pygame.image.load(image_file).convert()
+            self.image = assets.image(image_file)
             # TODO: Make image size dynamic rather than fixed
             size = self.image.get_size()
             self.rect = (rect[0], rect[1], size[0], size[1])
@@ -65,7 +70,10 @@ class ImageButton:
                 self.image.fill(pygame.Color("purple"))
 
         if text is not None and isinstance(text, str):
-            font = pygame.font.SysFont(None, 48)
+            if image_file is not None:
+                # the loaded image is shared with other buttons, so the text goes on a copy
+                self.image = self.image.copy()
+            font = fonts.get_font(None, 48)
             text_image = font.render(text, True, pygame.Color("white"))
             self.image.blit(text_image, (0, 0))
 
@@ -85,7 +93,7 @@ class ImageButton:
     def update_hover_text(self, description):
         if description != self.hover_text:
             self.hover_text = description
-            hover_font = pygame.font.SysFont(None, 26)
+            hover_font = fonts.get_font(None, 26)
             self.hover_text_image = pygame.Surface(self.hover_size).convert()
             self.hover_text_image.fill(pygame.Color("orange"))
             draw_shadowed_text(self.hover_text_image, description, pygame.Color("white"),